@@ -2,14 +2,28 @@ import time
 import threading
 import queue
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, NamedTuple, Tuple
+from dataclasses import dataclass, asdict, is_dataclass, fields, field, replace as dataclass_replace
 import statistics
 from enum import Enum
 from collections import deque
+from functools import lru_cache
 import math
+import struct
+import operator
+from array import array
+import heapq
+import asyncio
+import itertools
+import os
+import sqlite3
+import argparse
+import atexit
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, make_server
 
-import socket
 import json
 
 
@@ -17,6 +31,99 @@ import json
 WATCH_IP = '10.125.106.238' 
 WATCH_PORT = 8080          
 LISTENER_PORT = 8081      
+WATCH_CONNECT_TIMEOUT = 2.0
+WATCH_SEND_TIMEOUT = 0.5
+WATCH_BACKOFF_MIN = 0.5
+WATCH_BACKOFF_MAX = 30.0
+WATCH_STABLE_LINK = 10.0  # seconds a link must stay up before backoff resets
+WATCH_QUEUE_SIZE = 32
+WATCH_MAX_FRAME = 1024
+
+# Compact binary watch frame, sent once a watch asks for it with "FORMAT BINARY"
+# (5 bytes, big-endian): magic 0xA5 | load % 0-100 | flags | snooze seconds (uint16)
+# flags: bit 0 = vibrate, bit 1 = snooze feature enabled. JSON lines stay the default.
+WATCH_FRAME = struct.Struct('>BBBH')
+WATCH_FRAME_MAGIC = 0xA5
+
+# --- INPUT CAPTURE ---
+# "exact" sums every pointer event on pynput's thread; "batched" only records
+# samples into a ring and measures the path once per window (see InputMonitor).
+MOUSE_INGEST_MODE = "exact"
+MOUSE_TARGET_HZ = None  # batched mode: keep at most this many samples per second
+MOUSE_MAX_HZ = 1000     # batched mode: fastest pointer polling the ring must absorb
+# Opt-in: also record every key press and click (timestamp + event code) so the
+# analyzer can look at typing rhythm, not just per-window totals.
+INPUT_EVENT_STREAM = False
+EVENT_MAX_HZ = 500     # key presses + clicks per second the rings must absorb
+# Rings hold one WINDOW_SECONDS window at those rates, with this much headroom
+INPUT_RING_HEADROOM = 1.5
+EVENT_KEY = 1          # printable key
+EVENT_KEY_SPECIAL = 2  # modifier, navigation, enter, backspace...
+EVENT_CLICK = 3
+TYPING_BURST_GAP = 1.0  # seconds between key presses that end a typing burst
+
+# --- API SERVER ---
+API_HOST = '0.0.0.0'
+API_PORT = 80
+# Request threads in --production mode. Every open /api/events stream holds
+# one, so keep this comfortably above SSE_MAX_SUBSCRIBERS
+API_THREADS = 32
+
+# --- DASHBOARD EVENTS ---
+SSE_MAX_SUBSCRIBERS = 16
+SSE_KEEPALIVE = 15.0  # seconds; also how fast a closed client is noticed
+# SystemState fields pushed to dashboards (see EventHub) and how
+# /api/snapshot groups them
+SNAPSHOT_GROUPS = {
+    "state": ("monitoring_active", "is_snoozed", "snooze_until", "current_alert", "break_history",
+              "context", "paired_devices"),
+    "settings": ("auto_start_enabled", "snooze_feature_enabled", "snooze_timer", "baseline_half_life_minutes"),
+    "focus": ("focus_level",),
+}
+EVENT_FIELDS = ("monitoring_active", "focus_level", "is_snoozed", "snooze_until", "current_alert",
+                "break_history", "auto_start_enabled", "snooze_feature_enabled", "snooze_timer",
+                "baseline_half_life_minutes", "context", "paired_devices")
+
+# --- FOCUS ANALYSIS ---
+def _window_seconds() -> float:
+    raw = os.environ.get('COGLOAD_WINDOW_SECONDS', '5')
+    try:
+        seconds = float(raw)
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise SystemExit(f"[Server] COGLOAD_WINDOW_SECONDS must be a positive number of seconds, got {raw!r}")
+    return seconds
+
+# Sampling window length, per deployment. Baselines are learned per window,
+# so changing it starts them fresh (see BaselineStore)
+WINDOW_SECONDS = _window_seconds()
+BASELINE_WARMUP_WINDOWS = 11
+BASELINE_HALF_LIFE_MINUTES = 30.0
+BASELINE_STORE_PATH = os.path.join(os.path.expanduser('~'), '.cogload', 'baselines.bin')
+BASELINE_SAVE_EVERY = max(1, round(300 / WINDOW_SECONDS))  # windows between periodic saves (5 min)
+RECENT_RESTORE_MAX_AGE = 600  # seconds; older rolling windows are not restored
+PROFILE_BUCKET_HOURS = 1      # time-of-day profile granularity
+MAX_PROFILE_CONTEXTS = 32     # client-supplied context keys, "" is the default
+# Focus history (see FocusHistory)
+HISTORY_DB_PATH = os.path.join(os.path.expanduser('~'), '.cogload', 'history.db')
+HISTORY_RETENTION_DAYS = 30
+HISTORY_FLUSH_EVERY = max(1, round(60 / WINDOW_SECONDS))  # windows per write transaction
+# Bucket seconds of the persisted roll-ups; ones no longer than a window
+# would hold a single window each, so those are left to the raw samples
+HISTORY_ROLLUPS = tuple(seconds for seconds in (60, 900, 3600) if seconds > WINDOW_SECONDS)
+HISTORY_MAX_BUCKETS = 5000         # per range query
+HISTORY_DEFAULT_LIMIT = 720        # raw windows per /api/data/history call by default
+HISTORY_MAX_LIMIT = 20000          # and at most; longer ranges go through the roll-ups
+# Optional JSON file replacing DEFAULT_SCORING (see ScoringPipeline)
+SCORING_CONFIG_PATH = os.environ.get('COGLOAD_SCORING_CONFIG')
+# Online model learned from alert responses (see FocusModel); needs NumPy
+FOCUS_MODEL_ENABLED = True
+MODEL_LEARNING_RATE = 0.2
+MODEL_L2 = 1e-3
+MODEL_MIN_PER_LABEL = 3       # breaks taken and dismissals needed before it acts
+MODEL_SUPPRESS_BELOW = 0.25   # P(needs a break) under which a flagged alert is skipped
+MODEL_PENDING_ALERTS = 64  # feature vectors kept for unanswered alerts
 
 
 try:
@@ -25,6 +132,18 @@ try:
 except ImportError:
     PYNPUT_AVAILABLE = False
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import waitress
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
 class AlertType(Enum):
     FOCUS_DROP = "focus_drop"
     BREAK_SUGGESTION = "break_suggestion"
@@ -51,9 +170,37 @@ class UserInteraction:
     mouse_movement_distance: float
     mouse_click_count: int
     idle_time: float
+    # Event-stream mode only: monotonic timestamps and EVENT_* codes
+    key_times: Optional[array] = None
+    key_codes: Optional[array] = None
+    click_times: Optional[array] = None
     
-@dataclass
+def _event_value(value):
+    # Detach from live state: lists are copied, dataclasses become dicts
+    if is_dataclass(value):
+        return asdict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+@dataclass(frozen=True)
 class SystemState:
+    """
+    One immutable snapshot of the shared state. Nothing mutates a
+    SystemState: FocusMonitoringSystem.update_state() derives the next one
+    with replace() and swaps a single reference, so whoever holds a
+    snapshot sees a consistent set of fields (a snooze's flag and deadline
+    together) without taking a lock. Collections are tuples for the same
+    reason. to_json() is computed at most once per snapshot and reuses the
+    encoded form of every field the change did not touch.
+    """
     monitoring_active: bool = False
     auto_start_enabled: bool = False
     snooze_feature_enabled: bool = True
@@ -61,26 +208,121 @@ class SystemState:
     focus_level: float = 0.8
     is_snoozed: bool = False
     snooze_until: Optional[datetime] = None
-    paired_devices: List[str] = None
+    paired_devices: Tuple[str, ...] = ()
     snooze_timer: int = 0.0833
 
     watch_update_interval: float = 5.0
+    baseline_half_life_minutes: float = BASELINE_HALF_LIFE_MINUTES
 
-    break_history: List[Dict] = None
+    context: str = ""
+    current_alert: Optional[Alert] = None
+
+    break_history: Tuple[Dict, ...] = ()
+    baselines: Dict[str, Any] = field(default_factory=dict)
     
     def __post_init__(self):
-        if self.paired_devices is None:
-            self.paired_devices = []
-        if self.break_history is None:
-            self.break_history = []
+        object.__setattr__(self, '_fragments', {})
+        object.__setattr__(self, '_json', None)
+
+    def replace(self, **changes) -> "SystemState":
+        state = dataclass_replace(self, **changes)
+        # dict() copies in one step even while a reader fills in fragments
+        fragments = dict(self._fragments)
+        for name in changes:
+            fragments.pop(name, None)
+        object.__setattr__(state, '_fragments', fragments)
+        return state
+
+    def to_json(self) -> bytes:
+        # Racing readers may both encode a field; they produce the same text
+        if self._json is None:
+            fragments = self._fragments
+            names = [f.name for f in fields(self)]
+            for name in names:
+                if name not in fragments:
+                    fragments[name] = json.dumps(_event_value(getattr(self, name)), default=_json_default)
+            object.__setattr__(self, '_json', ('{' + ', '.join(
+                f'"{name}": {fragments[name]}' for name in names) + '}').encode())
+        return self._json
+
+class SampleRing:
+    """
+    Single-producer/single-consumer ring of parallel array columns.
+
+    The producer (a pynput thread) writes one row at head & mask and then
+    bumps head; the consumer copies out everything up to the head it saw and
+    moves tail. Neither side locks. If the producer laps the consumer, the
+    oldest rows are lost and counted in dropped, so size it with headroom.
+    """
+    def __init__(self, capacity: int, typecodes: str):
+        size = 1 << max(0, capacity - 1).bit_length()
+        self.mask = size - 1
+        self.columns = [array(t, bytes(array(t).itemsize * size)) for t in typecodes]
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def drain(self) -> List[array]:
+        head = self.head
+        tail = max(self.tail, head - self.mask - 1)
+        self.dropped += tail - self.tail
+        self.tail = head
+        start, stop = tail & self.mask, head & self.mask
+        if head == tail:
+            return [col[:0] for col in self.columns]
+        if start < stop:
+            return [col[start:stop] for col in self.columns]
+        return [col[start:] + col[:stop] for col in self.columns]
+
+    @staticmethod
+    def for_window(rate_hz: float, typecodes: str) -> 'SampleRing':
+        return SampleRing(math.ceil(INPUT_RING_HEADROOM * WINDOW_SECONDS * rate_hz), typecodes)
+
+# Mouse moves only read the clock every Nth event (and on the first one of a
+# window), so idle time is exact to within this many move events.
+MOUSE_STAMP_STRIDE = 8
 
 class InputMonitor:
-    def __init__(self):
-        self.keystroke_count = 0
-        self.mouse_distance = 0.0
-        self.mouse_clicks = 0
-        self.last_activity = time.time()
-        self.last_mouse_pos = None
+    """
+    Counters are running totals that are never reset. Each one has a single
+    writer (pynput's keyboard or mouse thread), so increments need no lock and
+    cannot be lost; get_and_reset_metrics() diffs the totals against the
+    previous sample instead of zeroing them under the writers' feet.
+
+    mouse_mode="batched" moves the path math off pynput's thread: each move
+    only stores (x, y, t) in a preallocated SampleRing, optionally decimated
+    to mouse_rate_hz, and the sampler measures the whole window in one
+    vectorized pass. The batched distance never exceeds the per-event sum and
+    equals it whenever the pointer moves in a straight line within each
+    1/mouse_rate_hz slice (always, without decimation).
+
+    event_stream=True additionally records each key press and click as a
+    (timestamp, code) row in bounded SampleRings, handed to the analyzer as
+    typed arrays on the UserInteraction rather than one object per event.
+    """
+    def __init__(self, mouse_mode: str = MOUSE_INGEST_MODE, mouse_rate_hz: Optional[float] = MOUSE_TARGET_HZ,
+                 event_stream: bool = INPUT_EVENT_STREAM):
+        now = time.monotonic()
+        self.key_ring = SampleRing.for_window(EVENT_MAX_HZ, 'dB') if event_stream else None
+        self.click_ring = SampleRing.for_window(EVENT_MAX_HZ, 'd') if event_stream else None
+        mouse_hz = min(MOUSE_MAX_HZ, mouse_rate_hz or MOUSE_MAX_HZ)
+        self.mouse_ring = SampleRing.for_window(mouse_hz, 'ddd') if mouse_mode == "batched" else None
+        self.reported_drops = 0
+        self.min_interval = 1.0 / mouse_rate_hz if mouse_rate_hz else 0.0
+        self.path_end = None
+        # Keyboard thread
+        self.key_total = 0
+        self.key_time = now
+        # Mouse thread
+        self.click_total = 0
+        self.move_total = 0
+        self.distance_total = 0.0
+        self.mouse_time = now
+        self.last_x = 0
+        self.last_y = 0
+        self.stamp_due = False
+        # Sampler thread: totals at the previous sample
+        self.sampled = (0, 0.0, 0)
         self.keyboard_listener = None
         self.mouse_listener = None
         
@@ -91,7 +333,7 @@ class InputMonitor:
         try:
             self.keyboard_listener = keyboard.Listener(on_press=self._on_key_press)
             self.mouse_listener = mouse.Listener(
-                on_move=self._on_mouse_move,
+                on_move=self._on_mouse_move if self.mouse_ring is None else self._on_mouse_sample,
                 on_click=self._on_mouse_click
             )
             self.keyboard_listener.start()
@@ -107,115 +349,1098 @@ class InputMonitor:
             self.mouse_listener.stop()
     
     def _on_key_press(self, key):
-        self.keystroke_count += 1
-        self.last_activity = time.time()
+        t = time.monotonic()
+        self.key_total += 1
+        self.key_time = t
+        ring = self.key_ring
+        if ring is not None:
+            times, codes = ring.columns
+            i = ring.head & ring.mask
+            times[i] = t
+            codes[i] = EVENT_KEY if getattr(key, 'char', None) else EVENT_KEY_SPECIAL
+            ring.head += 1
     
     def _on_mouse_move(self, x, y):
-        current_pos = (x, y)
-        if self.last_mouse_pos:
-            dx = current_pos[0] - self.last_mouse_pos[0]
-            dy = current_pos[1] - self.last_mouse_pos[1]
-            self.mouse_distance += math.sqrt(dx*dx + dy*dy)
-            self.last_activity = time.time()
-        self.last_mouse_pos = current_pos
+        moves = self.move_total
+        if moves:
+            self.distance_total += math.hypot(x - self.last_x, y - self.last_y)
+            if self.stamp_due or not moves % MOUSE_STAMP_STRIDE:
+                self.mouse_time = time.monotonic()
+                self.stamp_due = False
+        self.last_x = x
+        self.last_y = y
+        self.move_total = moves + 1
     
+    def _on_mouse_sample(self, x, y):
+        t = time.monotonic()
+        self.last_x = x
+        self.last_y = y
+        if t - self.mouse_time < self.min_interval:
+            return
+        self.mouse_time = t
+        ring = self.mouse_ring
+        i = ring.head & ring.mask
+        xs, ys, ts = ring.columns
+        xs[i] = x
+        ys[i] = y
+        ts[i] = t
+        ring.head += 1
+
+    def _measure_path(self) -> float:
+        xs, ys, _ = self.mouse_ring.drain()
+        if not xs:
+            return 0.0
+        # Stitch onto the previous window and end at the pointer's current
+        # position, so decimated tails are not lost
+        if self.path_end is not None:
+            xs.insert(0, self.path_end[0])
+            ys.insert(0, self.path_end[1])
+        xs.append(self.last_x)
+        ys.append(self.last_y)
+        self.path_end = (xs[-1], ys[-1])
+        if NUMPY_AVAILABLE:
+            x = np.frombuffer(xs, dtype=np.float64)
+            y = np.frombuffer(ys, dtype=np.float64)
+            return float(np.hypot(np.diff(x), np.diff(y)).sum())
+        sub = operator.sub
+        return math.fsum(map(math.hypot, map(sub, xs[1:], xs), map(sub, ys[1:], ys)))
+
     def _on_mouse_click(self, x, y, button, pressed):
         if pressed:
-            self.mouse_clicks += 1
-            self.last_activity = time.time()
+            t = time.monotonic()
+            self.click_total += 1
+            self.mouse_time = t
+            ring = self.click_ring
+            if ring is not None:
+                ring.columns[0][ring.head & ring.mask] = t
+                ring.head += 1
     
     def get_and_reset_metrics(self) -> UserInteraction:
-        now = time.time()
+        if self.mouse_ring is not None:
+            self.distance_total += self._measure_path()
+        prev_keys, prev_distance, prev_clicks = self.sampled
+        self.sampled = keys, distance, clicks = self.key_total, self.distance_total, self.click_total
+        self.stamp_due = True
         interaction = UserInteraction(
             timestamp=datetime.now(),
-            keystroke_count=self.keystroke_count,
-            mouse_movement_distance=self.mouse_distance,
-            mouse_click_count=self.mouse_clicks,
-            idle_time=now - self.last_activity
+            keystroke_count=keys - prev_keys,
+            mouse_movement_distance=distance - prev_distance,
+            mouse_click_count=clicks - prev_clicks,
+            idle_time=time.monotonic() - max(self.key_time, self.mouse_time)
         )
-        self.keystroke_count = 0
-        self.mouse_distance = 0.0
-        self.mouse_clicks = 0
+        if self.key_ring is not None:
+            interaction.key_times, interaction.key_codes = self.key_ring.drain()
+            interaction.click_times, = self.click_ring.drain()
+        dropped = self.dropped()
+        if sum(dropped.values()) > self.reported_drops:
+            print(f"[Input] Sample rings overflowed, lost so far: {dropped} "
+                  f"(raise MOUSE_MAX_HZ / EVENT_MAX_HZ)", flush=True)
+            self.reported_drops = sum(dropped.values())
         return interaction
+
+    def dropped(self) -> Dict[str, int]:
+        # Rows overwritten before the sampler drained them, since start
+        rings = {"mouse": self.mouse_ring, "keys": self.key_ring, "clicks": self.click_ring}
+        return {name: ring.dropped for name, ring in rings.items() if ring is not None}
+class RollingStats:
+    """
+    Mean and sample standard deviation of the last `size` values, O(1) per
+    push. Keeps a running sum and sum of squares over a fixed ring; both are
+    re-summed exactly once per `size` pushes so float error cannot build up.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.values = [0.0] * size
+        self.count = 0
+        self.pos = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, x: float):
+        if self.count == self.size:
+            old = self.values[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.pos] = x
+        self.total += x
+        self.total_sq += x * x
+        self.pos += 1
+        if self.pos == self.size:
+            self.pos = 0
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def ordered(self) -> List[float]:
+        # Oldest first
+        if self.count < self.size:
+            return self.values[:self.count]
+        return self.values[self.pos:] + self.values[:self.pos]
+
+    def stdev(self) -> float:
+        n = self.count
+        if n < 2:
+            return 0.0
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+class AdaptiveBaseline:
+    """
+    Exponentially weighted mean and variance of a per-window feature, O(1)
+    per update. The weight is max(1/n, alpha): a plain running mean while
+    young, so after the warm-up it equals the old one-shot baseline, then an
+    EWMA with the given half-life (in windows) so it follows the user through
+    the day instead of freezing on their first minute.
+    """
+    def __init__(self, half_life: float, warmup: int = BASELINE_WARMUP_WINDOWS):
+        self.warmup = warmup
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.set_half_life(half_life)
+
+    def set_half_life(self, half_life: float):
+        self.half_life = half_life
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.warmup
+
+    def update(self, x: float):
+        self.count += 1
+        alpha = max(self.alpha, 1.0 / self.count)
+        diff = x - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1.0 - alpha) * (self.var + diff * incr)
+
+    def value(self) -> Optional[float]:
+        return self.mean if self.ready else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {"mean": self.mean, "stdev": math.sqrt(self.var), "windows": self.count, "ready": self.ready}
+
+class BaselineProfiles:
+    """
+    Baselines per (context, time-of-day bucket) so coding at 10:00 is not
+    judged against email at 16:00. Context keys come from the client ("" is
+    the default) and map to a row index once; every profile is six doubles
+    (count, mean, var for typing, then mouse) in one flat array, so a lookup
+    or update is a little index arithmetic, never a scan. Updates use the
+    same rule as AdaptiveBaseline.update.
+    """
+    FIELDS = 6
+
+    def __init__(self, half_life: float, warmup: int = BASELINE_WARMUP_WINDOWS):
+        self.warmup = warmup
+        self.buckets = 24 // PROFILE_BUCKET_HOURS
+        self.contexts: Dict[str, int] = {"": 0}
+        self.table = array('d', bytes(8 * self.FIELDS * self.buckets * MAX_PROFILE_CONTEXTS))
+        self.set_half_life(half_life)
+
+    def set_half_life(self, half_life: float):
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+
+    def context_index(self, key: str) -> int:
+        index = self.contexts.get(key)
+        if index is None:
+            if len(self.contexts) >= MAX_PROFILE_CONTEXTS:
+                raise ValueError(f"at most {MAX_PROFILE_CONTEXTS - 1} contexts can be tracked")
+            index = self.contexts[key] = len(self.contexts)
+        return index
+
+    def slot(self, context: int, when: datetime) -> int:
+        return (context * self.buckets + when.hour // PROFILE_BUCKET_HOURS) * self.FIELDS
+
+    def update(self, slot: int, keys: float, mouse: float):
+        t = self.table
+        for i, x in ((slot, keys), (slot + 3, mouse)):
+            n = t[i] + 1
+            alpha = max(self.alpha, 1.0 / n)
+            diff = x - t[i + 1]
+            incr = alpha * diff
+            t[i] = n
+            t[i + 1] += incr
+            t[i + 2] = (1.0 - alpha) * (t[i + 2] + diff * incr)
+
+    def lookup(self, slot: int):
+        # (typing mean, mouse mean), None where the profile is still warming up
+        t = self.table
+        return (t[slot + 1] if t[slot] >= self.warmup else None,
+                t[slot + 4] if t[slot + 3] >= self.warmup else None)
+
+    def summary(self, slot: int) -> Dict[str, Any]:
+        t = self.table
+        return {
+            "typing": {"mean": t[slot + 1], "stdev": math.sqrt(t[slot + 2]), "windows": int(t[slot])},
+            "mouse": {"mean": t[slot + 4], "stdev": math.sqrt(t[slot + 5]), "windows": int(t[slot + 3])},
+        }
+
+# Each component scores 0..1 and contributes weight x score. Rules are tried
+# in order and the first whose conditions all hold gives the score, else
+# "default"; if any feature a component uses is unavailable (e.g. no baseline
+# yet) it scores "missing" instead. Conditions are {feature: [op, value]}.
+DEFAULT_SCORING = {
+    "components": [
+        {"name": "typing", "weight": 0.4, "missing": 0.5, "default": 0.2, "rules": [
+            {"when": {"typing_ratio": [">", 0.8]}, "score": 0.9},
+            {"when": {"typing_ratio": [">", 0.5]}, "score": 0.7},
+            {"when": {"typing_ratio": [">", 0.2]}, "score": 0.4},
+        ]},
+        {"name": "mouse", "weight": 0.3, "missing": 0.5, "default": 0.3, "rules": [
+            {"when": {"mouse_ratio": [">", 0.7], "mouse_stdev": [">", 10]}, "score": 0.8},
+            {"when": {"mouse_ratio": [">", 0.3]}, "score": 0.5},
+        ]},
+        {"name": "activity", "weight": 0.3, "missing": 0.5, "default": 0.1, "rules": [
+            {"when": {"idle_mean": ["<", 2.0]}, "score": 0.9},
+            {"when": {"idle_mean": ["<", 5.0]}, "score": 0.6},
+            {"when": {"idle_mean": ["<", 10.0]}, "score": 0.3},
+        ]},
+    ]
+}
+
+def _ratio(value: float, baseline: Optional[float]) -> Optional[float]:
+    return value / baseline if baseline else None
+
+def _rhythm(name: str):
+    return lambda a: a.typing_rhythm[name] if a.typing_rhythm else None
+
+# Feature extractors over a live FocusAnalyzer; None means "not available"
+SCORING_FEATURES = {
+    "typing_ratio": lambda a: _ratio(a.recent_keys.mean(), a.typing_baseline),
+    "mouse_ratio": lambda a: _ratio(a.recent_mouse.mean(), a.mouse_baseline),
+    "mouse_stdev": lambda a: a.recent_mouse.stdev(),
+    "keys_mean": lambda a: a.recent_keys.mean(),
+    "mouse_mean": lambda a: a.recent_mouse.mean(),
+    "idle_mean": lambda a: a.recent_idle.mean(),
+    "iki_mean": _rhythm("iki_mean"),
+    "iki_cv": _rhythm("iki_cv"),
+    "burst_length": _rhythm("burst_length"),
+    "special_ratio": _rhythm("special_ratio"),
+}
+
+SCORING_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+
+class ScoringPipeline:
+    """
+    Declarative focus scoring (see DEFAULT_SCORING), validated and compiled
+    once. score() evaluates each feature the config mentions exactly once and
+    then walks flat tuples of (feature, op, threshold), so a tick costs about
+    what the old hardcoded methods did. score_arrays() evaluates the same
+    config as NumPy expressions over whole feature columns.
+    """
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or DEFAULT_SCORING
+        names = []
+        self.components = []
+        for component in self.config["components"]:
+            rules = []
+            needs = set()
+            for rule in component.get("rules", []):
+                checks = []
+                for feature, (op, threshold) in rule["when"].items():
+                    if feature not in SCORING_FEATURES:
+                        raise ValueError(f"unknown scoring feature {feature!r}")
+                    if op not in SCORING_OPS:
+                        raise ValueError(f"unknown comparison {op!r}")
+                    checks.append((feature, SCORING_OPS[op], float(threshold)))
+                    needs.add(feature)
+                rules.append((tuple(checks), float(rule["score"])))
+            names.extend(n for n in sorted(needs) if n not in names)
+            self.components.append((
+                float(component["weight"]), float(component.get("missing", 0.5)),
+                float(component.get("default", 0.0)), tuple(sorted(needs)), tuple(rules)))
+        self.features = tuple((name, SCORING_FEATURES[name]) for name in names)
+
+    @classmethod
+    def load(cls, path: Optional[str] = SCORING_CONFIG_PATH) -> "ScoringPipeline":
+        if not path:
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def score(self, analyzer) -> float:
+        values = {name: extract(analyzer) for name, extract in self.features}
+        total = 0.0
+        for weight, missing, default, needs, rules in self.components:
+            score = default
+            if any(values[name] is None for name in needs):
+                score = missing
+            else:
+                for checks, rule_score in rules:
+                    if all(op(values[name], threshold) for name, op, threshold in checks):
+                        score = rule_score
+                        break
+            total += weight * score
+        return max(0.0, min(1.0, total))
+
+    def score_arrays(self, features: Dict[str, Any]):
+        # features: name -> float array, NaN where the feature is unavailable
+        n = len(next(iter(features.values())))
+        total = np.zeros(n)
+        for weight, missing, default, needs, rules in self.components:
+            for name in needs:
+                if name not in features:
+                    raise ValueError(f"feature {name!r} is not available for batch scoring")
+            conditions = [np.logical_and.reduce([op(features[name], threshold) for name, op, threshold in checks])
+                          if checks else np.ones(n, dtype=bool) for checks, _ in rules]
+            score = np.select(conditions, [rule_score for _, rule_score in rules], default)
+            if needs:
+                unavailable = np.logical_or.reduce([np.isnan(features[name]) for name in needs])
+                score = np.where(unavailable, missing, score)
+            total += weight * score
+        return np.clip(total, 0.0, 1.0)
+
+# Model inputs: (pipeline feature, value when unavailable, scale). Features
+# are divided by their scale and clipped to [0, 4] so no single one dominates
+MODEL_FEATURES = (
+    ("typing_ratio", 1.0, 1.0),
+    ("mouse_ratio", 1.0, 1.0),
+    ("mouse_stdev", 0.0, 500.0),
+    ("idle_mean", 0.0, WINDOW_SECONDS),
+    ("iki_mean", 0.0, 0.5),
+    ("iki_cv", 0.0, 1.0),
+    ("burst_length", 0.0, 20.0),
+    ("special_ratio", 0.0, 1.0),
+)
+
+class FocusModel:
+    """
+    Online logistic regression estimating P(the user needs a break) from the
+    current window's features plus the rule score. It learns one example per
+    answered alert: "take_break" is a positive, "dismiss" a negative; snoozes
+    teach nothing. Weights are a fixed NumPy vector updated by one SGD step
+    per label, so memory is bounded and predict/learn cost a few
+    microseconds.
+
+    It never changes the focus score. Since it only ever sees windows the
+    rules flagged, it is only asked about those: should_alert() lets the
+    alert through unless the model is ready (both answers seen at least
+    MODEL_MIN_PER_LABEL times) and confident the user would dismiss it.
+    """
+    def __init__(self, learning_rate: float = MODEL_LEARNING_RATE, l2: float = MODEL_L2):
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.extract = tuple((SCORING_FEATURES[name], missing, 1.0 / scale) for name, missing, scale in MODEL_FEATURES)
+        # bias, rule score, then MODEL_FEATURES
+        self.weights = np.zeros(len(MODEL_FEATURES) + 2)
+        self.positives = 0
+        self.negatives = 0
+
+    def features(self, analyzer, rule_score: float):
+        x = [1.0, rule_score]
+        for extract, missing, inv_scale in self.extract:
+            value = extract(analyzer)
+            x.append(min(4.0, max(0.0, (missing if value is None else value) * inv_scale)))
+        return np.array(x)
+
+    def predict(self, x) -> float:
+        # P(needs a break)
+        z = float(x @ self.weights)
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+    def ready(self) -> bool:
+        # One-sided answers only teach the bias, so it needs both kinds
+        return min(self.positives, self.negatives) >= MODEL_MIN_PER_LABEL
+
+    def should_alert(self, x) -> bool:
+        return not self.ready() or self.predict(x) >= MODEL_SUPPRESS_BELOW
+
+    def learn(self, x, label: float):
+        error = self.predict(x) - label
+        # Weights are swapped in whole so a concurrent predict sees old or new
+        self.weights = self.weights - self.learning_rate * (error * x + self.l2 * self.weights)
+        if label:
+            self.positives += 1
+        else:
+            self.negatives += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {"breaks_taken": self.positives, "dismissed": self.negatives, "active": self.ready()}
+
 class FocusAnalyzer:
     """
     FOCUS CALCULATION ALGORITHM:
     ===========================
     Calculates focus level (0.0 to 1.0) based on keyboard/mouse patterns:
     
-    1. Collects data in 5-second windows
-    2. Establishes user baselines after 50 seconds (10 windows)
+    1. Collects data in WINDOW_SECONDS windows (5 s unless configured with
+       COGLOAD_WINDOW_SECONDS) and scores the last `window` of them
+    2. Establishes user baselines after 11 windows, then keeps adapting them
+       (exponentially weighted, configurable half-life; see AdaptiveBaseline).
+       Once a (context, hour-of-day) profile has warmed up it is used in place
+       of the global baseline (see BaselineProfiles)
     3. Score components:
        - Typing (40%): Compares current typing rate to baseline
        - Mouse (30%): Compares movement to baseline, checks variance
        - Activity (30%): Based on idle time between interactions
     4. Alert triggers when score < 0.6
     
-    Adjust baseline sensitivity by changing the ratio thresholds.
+    Weights and ratio thresholds live in DEFAULT_SCORING; point
+    COGLOAD_SCORING_CONFIG at a JSON file to try a different model. With a
+    FocusModel attached, alert_confirmed() lets it veto alerts the user's
+    past responses say are unwanted; the score itself stays rule-based.
     """
-    def __init__(self):
-        self.interactions = deque(maxlen=60)
+    def __init__(self, window: int = 5, baseline_half_life: float = BASELINE_HALF_LIFE_MINUTES * 60 / WINDOW_SECONDS,
+                 pipeline: Optional[ScoringPipeline] = None, model: Optional[FocusModel] = None):
+        self.pipeline = pipeline or ScoringPipeline.load()
+        self.model = model
+        self.model_input = None  # features behind the last score, kept for alerts
+        # Rolling stats over the last `window` windows, updated per interaction
+        self.window = window
+        self.recent_keys = RollingStats(window)
+        self.recent_mouse = RollingStats(window)
+        self.recent_idle = RollingStats(window)
+        self.typing = AdaptiveBaseline(baseline_half_life)
+        self.mouse = AdaptiveBaseline(baseline_half_life)
+        self.profiles = BaselineProfiles(baseline_half_life)
+        self.context = ""
+        self.context_index = 0
+        self.profile_slot = 0
         self.typing_baseline = None
         self.mouse_baseline = None
+        self.typing_rhythm = None
+        self.last_key_time = None
         
     def add_interaction(self, interaction: UserInteraction):
-        self.interactions.append(interaction)
-        if len(self.interactions) > 10 and self.typing_baseline is None:
-            self._calculate_baselines()
+        self.recent_keys.push(interaction.keystroke_count)
+        self.recent_mouse.push(interaction.mouse_movement_distance)
+        self.recent_idle.push(interaction.idle_time)
+        self.typing.update(interaction.keystroke_count)
+        self.mouse.update(interaction.mouse_movement_distance)
+        self.profile_slot = self.profiles.slot(self.context_index, interaction.timestamp)
+        self.profiles.update(self.profile_slot, interaction.keystroke_count, interaction.mouse_movement_distance)
+        self._select_baselines()
+        if interaction.key_times is not None:
+            self.typing_rhythm = self.keystroke_interval_features(interaction.key_times, interaction.key_codes)
     
-    def _calculate_baselines(self):
-        keystrokes = [i.keystroke_count for i in self.interactions]
-        mouse_dist = [i.mouse_movement_distance for i in self.interactions]
-        self.typing_baseline = statistics.mean(keystrokes)
-        self.mouse_baseline = statistics.mean(mouse_dist)
+    def keystroke_interval_features(self, times: array, codes: array) -> Dict[str, float]:
+        """
+        Inter-keystroke interval (IKI) features for one window of the event
+        stream. Intervals are chained across windows; gaps longer than
+        TYPING_BURST_GAP split the stream into typing bursts.
+        """
+        n = len(times)
+        if n == 0:
+            return {"keys": 0, "iki_mean": 0.0, "iki_median": 0.0, "iki_cv": 0.0,
+                    "bursts": 0, "burst_length": 0.0, "special_ratio": 0.0}
+        prev = self.last_key_time
+        self.last_key_time = times[-1]
+        if NUMPY_AVAILABLE:
+            t = np.frombuffer(times, dtype=np.float64)
+            ikis = np.diff(t, prepend=prev) if prev is not None else np.diff(t)
+            special = int(np.count_nonzero(np.frombuffer(codes, dtype=np.uint8) == EVENT_KEY_SPECIAL))
+            gaps = int(np.count_nonzero(ikis > TYPING_BURST_GAP))
+            typed = ikis[ikis <= TYPING_BURST_GAP]
+            mean = float(typed.mean()) if len(typed) else 0.0
+            median = float(np.median(typed)) if len(typed) else 0.0
+            cv = float(typed.std() / mean) if mean else 0.0
+        else:
+            ikis = list(map(operator.sub, times[1:], times))
+            if prev is not None:
+                ikis.insert(0, times[0] - prev)
+            special = codes.count(EVENT_KEY_SPECIAL)
+            gaps = sum(1 for iki in ikis if iki > TYPING_BURST_GAP)
+            typed = [iki for iki in ikis if iki <= TYPING_BURST_GAP]
+            mean = statistics.fmean(typed) if typed else 0.0
+            median = statistics.median(typed) if typed else 0.0
+            cv = statistics.pstdev(typed, mean) / mean if mean else 0.0
+        # Every long gap starts a burst, and so does the very first key seen;
+        # a window that continues the previous burst adds none for its start
+        bursts = gaps + (1 if prev is None else 0)
+        return {"keys": n, "iki_mean": mean, "iki_median": median, "iki_cv": cv,
+                "bursts": bursts, "burst_length": n / bursts if bursts else float(n),
+                "special_ratio": special / n}
     
+    def _select_baselines(self):
+        typing, mouse = self.profiles.lookup(self.profile_slot)
+        self.typing_baseline = typing if typing is not None else self.typing.value()
+        self.mouse_baseline = mouse if mouse is not None else self.mouse.value()
+
+    def set_context(self, context: str):
+        # Raises ValueError (context unchanged) once MAX_PROFILE_CONTEXTS is reached
+        self.context_index = self.profiles.context_index(context)
+        self.context = context
+        self.profile_slot = self.profiles.slot(self.context_index, datetime.now())
+        self._select_baselines()
+
+    def set_baseline_half_life(self, half_life: float):
+        self.typing.set_half_life(half_life)
+        self.mouse.set_half_life(half_life)
+        self.profiles.set_half_life(half_life)
+
+    def has_score(self) -> bool:
+        return self.recent_keys.count >= self.window
+
+    def baseline_summary(self) -> Dict[str, Any]:
+        profile = self.profiles.summary(self.profile_slot)
+        profile["context"] = self.context
+        profile["hour_bucket"] = (self.profile_slot // BaselineProfiles.FIELDS) % self.profiles.buckets
+        summary = {"typing": self.typing.summary(), "mouse": self.mouse.summary(), "profile": profile}
+        if self.model is not None:
+            summary["model"] = self.model.summary()
+        return summary
+
     def calculate_focus_score(self) -> float:
-        if len(self.interactions) < 5:
+        if self.recent_keys.count < self.window:
             return 0.8
-            
-        recent = list(self.interactions)[-5:]
-        typing_score = self._analyze_typing_pattern(recent)
-        mouse_score = self._analyze_mouse_pattern(recent)
-        activity_score = self._analyze_activity_level(recent)
-        
-        focus_score = (typing_score * 0.4 + mouse_score * 0.3 + activity_score * 0.3)
-        return max(0.0, min(1.0, focus_score))
-    
-    def _analyze_typing_pattern(self, interactions: List[UserInteraction]) -> float:
-        keystrokes = [i.keystroke_count for i in interactions]
-        if not self.typing_baseline or self.typing_baseline == 0:
-            return 0.5
-        ratio = statistics.mean(keystrokes) / self.typing_baseline
-        if ratio > 0.8: return 0.9
-        elif ratio > 0.5: return 0.7
-        elif ratio > 0.2: return 0.4
-        else: return 0.2
-    
-    def _analyze_mouse_pattern(self, interactions: List[UserInteraction]) -> float:
-        distances = [i.mouse_movement_distance for i in interactions]
-        if not self.mouse_baseline or self.mouse_baseline == 0:
-            return 0.5
-        ratio = statistics.mean(distances) / self.mouse_baseline
-        variance = statistics.stdev(distances) if len(distances) > 1 else 0
-        if ratio > 0.7 and variance > 10: return 0.8
-        elif ratio > 0.3: return 0.5
-        else: return 0.3
-    
-    def _analyze_activity_level(self, interactions: List[UserInteraction]) -> float:
-        idle_times = [i.idle_time for i in interactions]
-        avg_idle = statistics.mean(idle_times)
-        if avg_idle < 2.0: return 0.9
-        elif avg_idle < 5.0: return 0.6
-        elif avg_idle < 10.0: return 0.3
-        else: return 0.1
+        score = self.pipeline.score(self)
+        if self.model is not None:
+            self.model_input = self.model.features(self, score)
+        return score
+
+    def alert_confirmed(self) -> bool:
+        # For a window the rules flagged: does the model agree it is worth an alert?
+        return self.model is None or self.model_input is None or self.model.should_alert(self.model_input)
+
+class VectorFocusAnalyzer:
+    """
+    NumPy twin of FocusAnalyzer for batch work such as replaying a recorded
+    session. Interactions live in a fixed-size structured array (a ring of
+    `capacity` windows, a day of windows by default) rather than as
+    UserInteraction objects, and score_windows() scores every sliding window in one
+    vectorized pass with the same rules as FocusAnalyzer: adaptive baselines
+    and time-of-day profiles (default context only, records carry no
+    context), the same ScoringPipeline, and a 5-window minimum for a score.
+    Scores are rule-only: a FocusModel's weights change as it learns, so
+    replaying it over old windows would not reproduce what was shown.
+    """
+    DTYPE = [('timestamp', 'f8'), ('keys', 'f8'), ('mouse', 'f8'), ('clicks', 'f8'), ('idle', 'f8')]
+
+    def __init__(self, capacity: int = int(86400 / WINDOW_SECONDS), window: int = 5,
+                 baseline_half_life: float = BASELINE_HALF_LIFE_MINUTES * 60 / WINDOW_SECONDS,
+                 pipeline: Optional[ScoringPipeline] = None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("VectorFocusAnalyzer requires NumPy")
+        self.pipeline = pipeline or ScoringPipeline.load()
+        self.window = window
+        self.baseline_half_life = baseline_half_life
+        self.records = np.zeros(capacity, dtype=self.DTYPE)
+        self.count = 0
+        self.typing = AdaptiveBaseline(baseline_half_life)
+        self.mouse = AdaptiveBaseline(baseline_half_life)
+        self.profiles = BaselineProfiles(baseline_half_life)
+        self.profile_slot = 0
+
+    def add_interaction(self, interaction: UserInteraction):
+        row = self.records[self.count % len(self.records)]
+        row['timestamp'] = interaction.timestamp.timestamp()
+        row['keys'] = interaction.keystroke_count
+        row['mouse'] = interaction.mouse_movement_distance
+        row['clicks'] = interaction.mouse_click_count
+        row['idle'] = interaction.idle_time
+        self.count += 1
+        self.typing.update(interaction.keystroke_count)
+        self.mouse.update(interaction.mouse_movement_distance)
+        self.profile_slot = self.profiles.slot(0, interaction.timestamp)
+        self.profiles.update(self.profile_slot, interaction.keystroke_count, interaction.mouse_movement_distance)
+
+    def _current_baselines(self):
+        typing, mouse = self.profiles.lookup(self.profile_slot)
+        if typing is None:
+            typing = self.typing.value()
+        if mouse is None:
+            mouse = self.mouse.value()
+        return (np.nan if typing is None else typing, np.nan if mouse is None else mouse)
+
+    def history(self):
+        # Oldest-first view of what is still in the ring
+        n = len(self.records)
+        if self.count <= n:
+            return self.records[:self.count]
+        split = self.count % n
+        return np.concatenate((self.records[split:], self.records[:split]))
+
+    def calculate_focus_score(self) -> float:
+        if self.count < self.window:
+            return 0.8
+        recent = self.history()[-self.window:]
+        typing_baseline, mouse_baseline = self._current_baselines()
+        return float(self._score(recent, typing_baseline, mouse_baseline)[-1])
+
+    def score_windows(self, records=None):
+        """
+        Score for every window that has `window` windows of history, oldest
+        first (one value per record from index window-1 on). Baselines are
+        replayed from the first record with the live update rule.
+        """
+        if records is None:
+            records = self.history()
+        if len(records) < self.window:
+            return np.empty(0)
+        typing_baseline, mouse_baseline = self._replay_baselines(records)
+        return self._score(records, typing_baseline, mouse_baseline)
+
+    def _replay_baselines(self, records):
+        # Profile bucket per record without a datetime each: UTC offsets and
+        # DST switches all fall on quarter hours, so the local hour is looked
+        # up once per distinct 15-minute block
+        quarters, inverse = np.unique(records['timestamp'] // 900, return_inverse=True)
+        hours = np.array([datetime.fromtimestamp(q * 900).hour for q in quarters.tolist()], dtype=int)
+        buckets = (hours // PROFILE_BUCKET_HOURS)[inverse].tolist()
+        # The EWMA recurrences are inherently sequential, so this step stays a
+        # scalar loop, but over local floats only. It is the update rule of
+        # AdaptiveBaseline/BaselineProfiles term for term (the variance is not
+        # needed here), so the replay matches what FocusAnalyzer computed
+        alpha = 1.0 - 0.5 ** (1.0 / self.baseline_half_life)
+        warmup = BASELINE_WARMUP_WINDOWS
+        nan = math.nan
+        n_count, n_typing, n_mouse = 0, 0.0, 0.0
+        p_count = [0] * (24 // PROFILE_BUCKET_HOURS)
+        p_typing = [0.0] * len(p_count)
+        p_mouse = [0.0] * len(p_count)
+        typing_out = [nan] * len(records)
+        mouse_out = [nan] * len(records)
+        rows = zip(buckets, records['keys'].tolist(), records['mouse'].tolist())
+        for i, (bucket, keys, mouse) in enumerate(rows):
+            n_count += 1
+            a = max(alpha, 1.0 / n_count)
+            n_typing += a * (keys - n_typing)
+            n_mouse += a * (mouse - n_mouse)
+            count = p_count[bucket] = p_count[bucket] + 1
+            a = max(alpha, 1.0 / count)
+            typing = p_typing[bucket] = p_typing[bucket] + a * (keys - p_typing[bucket])
+            mouse = p_mouse[bucket] = p_mouse[bucket] + a * (mouse - p_mouse[bucket])
+            if count >= warmup:
+                typing_out[i] = typing
+                mouse_out[i] = mouse
+            elif n_count >= warmup:
+                typing_out[i] = n_typing
+                mouse_out[i] = n_mouse
+        return np.array(typing_out), np.array(mouse_out)
+
+    @classmethod
+    def to_records(cls, interactions: List[UserInteraction]):
+        return np.array([(i.timestamp.timestamp(), i.keystroke_count, i.mouse_movement_distance,
+                          i.mouse_click_count, i.idle_time) for i in interactions], dtype=cls.DTYPE)
+
+    @classmethod
+    def score_session(cls, interactions: List[UserInteraction], window: int = 5):
+        analyzer = cls(capacity=1, window=window)
+        return analyzer.score_windows(cls.to_records(interactions))
+
+    def _score(self, records, typing_baseline, mouse_baseline):
+        windows = np.lib.stride_tricks.sliding_window_view
+        w = self.window
+        keys_mean = windows(records['keys'], w).mean(axis=1)
+        mouse = windows(records['mouse'], w)
+        mouse_mean = mouse.mean(axis=1)
+        mouse_std = mouse.std(axis=1, ddof=1) if w > 1 else np.zeros(len(mouse_mean))
+        idle_mean = windows(records['idle'], w).mean(axis=1)
+        typing_baseline = np.broadcast_to(np.asarray(typing_baseline, dtype=float), len(records))[w - 1:]
+        mouse_baseline = np.broadcast_to(np.asarray(mouse_baseline, dtype=float), len(records))[w - 1:]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            typing_ratio = np.where(typing_baseline != 0, keys_mean / typing_baseline, np.nan)
+            mouse_ratio = np.where(mouse_baseline != 0, mouse_mean / mouse_baseline, np.nan)
+
+        return self.pipeline.score_arrays({
+            "typing_ratio": typing_ratio,
+            "mouse_ratio": mouse_ratio,
+            "mouse_stdev": mouse_std,
+            "keys_mean": keys_mean,
+            "mouse_mean": mouse_mean,
+            "idle_mean": idle_mean,
+        })
+
+class BaselineStore:
+    """
+    Persists what FocusAnalyzer has learned so a restart does not wait a
+    minute for baselines: a few hundred bytes of packed structs written
+    atomically (temp file + rename) and read back with one read() and a few
+    unpack_from() calls, well under a millisecond.
+
+    Layout (little-endian): header, window length in seconds, typing and
+    mouse AdaptiveBaseline (count, mean, var), the rolling window
+    oldest-first as keys[n], mouse[n], idle[n], then the BaselineProfiles
+    (context count, bucket count, the context keys length-prefixed UTF-8 in
+    index order, the raw profile table) and the FocusModel (weight count,
+    label count, weights; count 0 without a model). The rolling window is
+    only restored if the file is younger than RECENT_RESTORE_MAX_AGE, since
+    it describes "just now". A file learned with another window length is
+    ignored, as its per-window baselines do not apply.
+    """
+    MAGIC = b'CLBS'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHdBB')  # magic, version, saved_at, window, filled
+    BASELINE = struct.Struct('<Qdd')
+    SAMPLING = struct.Struct('<d')  # window seconds
+    PROFILES = struct.Struct('<HH')  # contexts, buckets
+    MODEL = struct.Struct('<HII')  # weights, breaks taken, dismissals
+
+    def __init__(self, path: str = BASELINE_STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def save(self, analyzer: FocusAnalyzer):
+        recent = [analyzer.recent_keys.ordered(), analyzer.recent_mouse.ordered(), analyzer.recent_idle.ordered()]
+        filled = len(recent[0])
+        parts = [self.HEADER.pack(self.MAGIC, self.VERSION, time.time(), analyzer.window, filled),
+                 self.SAMPLING.pack(WINDOW_SECONDS)]
+        for baseline in (analyzer.typing, analyzer.mouse):
+            parts.append(self.BASELINE.pack(baseline.count, baseline.mean, baseline.var))
+        for values in recent:
+            parts.append(struct.pack(f'<{filled}d', *values))
+        profiles = analyzer.profiles
+        parts.append(self.PROFILES.pack(len(profiles.contexts), profiles.buckets))
+        for key in sorted(profiles.contexts, key=profiles.contexts.get):
+            encoded = key.encode('utf-8')
+            parts.append(struct.pack('<H', len(encoded)) + encoded)
+        used = len(profiles.contexts) * profiles.buckets * profiles.FIELDS
+        parts.append(profiles.table[:used].tobytes())
+        model = analyzer.model
+        if model is None:
+            parts.append(self.MODEL.pack(0, 0, 0))
+        else:
+            weights = model.weights
+            parts.append(self.MODEL.pack(len(weights), model.positives, model.negatives))
+            parts.append(struct.pack(f'<{len(weights)}d', *weights.tolist()))
+
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = f"{self.path}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(b''.join(parts))
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"[Baselines] Save failed: {e}")
+
+    def load(self, analyzer: FocusAnalyzer) -> bool:
+        # The whole file is parsed before anything is applied, so a truncated
+        # or corrupt file leaves the analyzer exactly as it was
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            restore = self._parse(data, analyzer)
+        except FileNotFoundError:
+            return False
+        except (OSError, struct.error, UnicodeDecodeError) as e:
+            print(f"[Baselines] Could not load {self.path}: {e}")
+            return False
+        if restore is None:
+            return False
+        for apply in restore:
+            apply()
+        analyzer.set_context(analyzer.context)
+        return True
+
+    def _parse(self, data: bytes, analyzer: FocusAnalyzer):
+        # List of callables that restore the file into `analyzer`, or None
+        magic, version, saved_at, window, filled = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION:
+            print(f"[Baselines] Ignoring {self.path}: unknown format")
+            return None
+        offset = self.HEADER.size
+        window_seconds, = self.SAMPLING.unpack_from(data, offset)
+        offset += self.SAMPLING.size
+        if window_seconds != WINDOW_SECONDS:
+            print(f"[Baselines] Ignoring {self.path}: learned with {window_seconds:g} s windows")
+            return None
+        restore = []
+        for baseline in (analyzer.typing, analyzer.mouse):
+            values = self.BASELINE.unpack_from(data, offset)
+            restore.append(lambda baseline=baseline, values=values: self._set_baseline(baseline, values))
+            offset += self.BASELINE.size
+        column = struct.Struct(f'<{filled}d')
+        columns = []
+        for _ in range(3):
+            columns.append(column.unpack_from(data, offset))
+            offset += column.size
+        if window == analyzer.window and time.time() - saved_at < RECENT_RESTORE_MAX_AGE:
+            for stats, values in zip((analyzer.recent_keys, analyzer.recent_mouse, analyzer.recent_idle), columns):
+                restore.append(lambda stats=stats, values=values: [stats.push(value) for value in values])
+        offset = self._parse_profiles(analyzer.profiles, data, offset, restore)
+        if analyzer.model is not None:
+            self._parse_model(analyzer.model, data, offset, restore)
+        return restore
+
+    @staticmethod
+    def _set_baseline(baseline: AdaptiveBaseline, values):
+        baseline.count, baseline.mean, baseline.var = values
+
+    def _parse_profiles(self, profiles: BaselineProfiles, data: bytes, offset: int, restore: list) -> int:
+        count, buckets = self.PROFILES.unpack_from(data, offset)
+        offset += self.PROFILES.size
+        keys = []
+        for _ in range(count):
+            length, = struct.unpack_from('<H', data, offset)
+            offset += 2
+            if offset + length > len(data):
+                raise struct.error("truncated context key")
+            keys.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        used = count * buckets * profiles.FIELDS
+        if buckets != profiles.buckets or count > MAX_PROFILE_CONTEXTS:
+            print("[Baselines] Profile layout changed, starting profiles fresh")
+            return offset + 8 * used
+        if offset + 8 * used > len(data):
+            raise struct.error("truncated profile table")
+        table = array('d')
+        table.frombytes(data[offset:offset + 8 * used])
+
+        def apply():
+            profiles.table[:used] = table
+            profiles.contexts = {key: index for index, key in enumerate(keys)}
+        restore.append(apply)
+        return offset + 8 * used
+
+    def _parse_model(self, model: FocusModel, data: bytes, offset: int, restore: list):
+        size, positives, negatives = self.MODEL.unpack_from(data, offset)
+        if size != len(model.weights):
+            if size:
+                print("[Baselines] Model features changed, starting the model fresh")
+            return
+        weights = np.array(struct.unpack_from(f'<{size}d', data, offset + self.MODEL.size))
+
+        def apply():
+            model.weights = weights
+            model.positives = positives
+            model.negatives = negatives
+        restore.append(apply)
+
+class FocusHistory:
+    """
+    Append-only history of every sampled window: (timestamp, focus, raw
+    features), focus NULL while there is no score yet. SQLite in WAL mode,
+    one table clustered on the timestamp (WITHOUT ROWID), so a time range is
+    a single index seek plus a sequential read, and API readers never block
+    the monitoring thread's writes.
+
+    Appends are buffered and written HISTORY_FLUSH_EVERY at a time in one
+    transaction, which keeps the per-window cost to a list append. Each flush
+    also drops rows older than HISTORY_RETENTION_DAYS, so the file stays
+    bounded (roughly 15 MB for 30 days of 5 s windows). Reads include rows
+    still in the buffer. The write itself runs outside the buffer lock, and
+    each batch bumps a counter in the same transaction, so a reader knows
+    whether its snapshot already holds the batch being written.
+
+    The same transaction folds the new windows into persisted focus roll-ups
+    (count, scored, sum, min, max per HISTORY_ROLLUPS bucket), so range
+    queries at any step are answered from the largest roll-up that fits in
+    it: a week at 15 min steps reads 672 rows, not 120,000 samples. Steps
+    finer than the smallest roll-up, down to single windows, come from the
+    samples themselves; this is the only store of focus at coarser
+    resolutions.
+    """
+    COLUMNS = ("ts", "focus", "keys", "mouse", "clicks", "idle")
+
+    def __init__(self, path: str = HISTORY_DB_PATH, retention_days: float = HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.retention = retention_days * 86400
+        self.lock = threading.Lock()          # guards pending/writing only
+        self.write_lock = threading.Lock()    # one flush at a time
+        self.pending = []
+        self.writing = None                   # (generation, rows) being written
+        self.next_generation = 1
+        self.readers = threading.local()
+        self.conn = None
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.conn = self._connect()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples (ts REAL PRIMARY KEY, focus REAL, keys REAL,"
+                " mouse REAL, clicks REAL, idle REAL) WITHOUT ROWID")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rollups (seconds INTEGER, start REAL, windows INTEGER,"
+                " scored INTEGER, focus_sum REAL, focus_min REAL, focus_max REAL,"
+                " PRIMARY KEY (seconds, start)) WITHOUT ROWID")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS flushes (id INTEGER PRIMARY KEY, generation INTEGER)")
+            self.conn.commit()
+            self.next_generation = self._flushed(self.conn) + 1
+        except (OSError, sqlite3.Error) as e:
+            print(f"[History] Disabled, could not open {path}: {e}")
+            self.conn = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def append(self, interaction: UserInteraction, focus: Optional[float]):
+        if self.conn is None:
+            return
+        row = (interaction.timestamp.timestamp(), focus, interaction.keystroke_count,
+               interaction.mouse_movement_distance, interaction.mouse_click_count, interaction.idle_time)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) < HISTORY_FLUSH_EVERY:
+                return
+        self.flush()
+
+    def flush(self):
+        if self.conn is None:
+            return
+        with self.write_lock:
+            with self.lock:
+                rows, self.pending = self.pending, []
+                if not rows:
+                    return
+                generation = self.next_generation
+                self.next_generation += 1
+                self.writing = (generation, rows)
+            try:
+                with self.conn:
+                    # Only windows that made it into samples go into the roll-ups: a
+                    # repeated timestamp (the wall clock stepped back) is ignored in both
+                    inserted = [row for row in rows if self.conn.execute(
+                        "INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?, ?)", row).rowcount]
+                    self.conn.executemany(
+                        "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (seconds, start) DO UPDATE SET"
+                        " windows = windows + excluded.windows, scored = scored + excluded.scored,"
+                        " focus_sum = focus_sum + excluded.focus_sum,"
+                        " focus_min = min(coalesce(focus_min, excluded.focus_min), coalesce(excluded.focus_min, focus_min)),"
+                        " focus_max = max(coalesce(focus_max, excluded.focus_max), coalesce(excluded.focus_max, focus_max))",
+                        [(seconds, start) + tuple(bucket) for (seconds, start), bucket in self._fold(inserted).items()])
+                    cutoff = rows[-1][0] - self.retention
+                    self.conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,))
+                    self.conn.execute("DELETE FROM rollups WHERE start < ?", (cutoff,))
+                    self.conn.execute("INSERT OR REPLACE INTO flushes VALUES (0, ?)", (generation,))
+            except sqlite3.Error as e:
+                print(f"[History] Write failed, dropped {len(rows)} windows: {e}")
+            finally:
+                with self.lock:
+                    self.writing = None
+
+    @staticmethod
+    def _fold(rows, tiers=HISTORY_ROLLUPS) -> Dict[tuple, list]:
+        # (bucket seconds, bucket start) -> [windows, scored, focus sum, min, max]
+        buckets = {}
+        for row in rows:
+            ts, focus = row[0], row[1]
+            for seconds in tiers:
+                key = (seconds, ts - ts % seconds)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = [0, 0, 0.0, None, None]
+                bucket[0] += 1
+                if focus is not None:
+                    bucket[1] += 1
+                    bucket[2] += focus
+                    bucket[3] = focus if bucket[3] is None else min(bucket[3], focus)
+                    bucket[4] = focus if bucket[4] is None else max(bucket[4], focus)
+        return buckets
+
+    def _reader(self):
+        reader = getattr(self.readers, "conn", None)
+        if reader is None:
+            reader = self.readers.conn = self._connect()
+        return reader
+
+    @staticmethod
+    def _flushed(conn) -> int:
+        return conn.execute("SELECT coalesce(max(generation), 0) FROM flushes").fetchone()[0]
+
+    def _read(self, sql: str, params: tuple, first: float, last: float):
+        """
+        Rows of `sql` plus the unwritten windows with first <= ts < last that
+        its snapshot lacks. Batches are copied before the snapshot is taken
+        and kept only if the snapshot's flush counter predates them, so a
+        batch committing meanwhile is counted exactly once.
+        """
+        with self.lock:
+            batches = [self.writing, (self.next_generation, list(self.pending))]
+        reader = self._reader()
+        reader.execute("BEGIN")
+        try:
+            flushed = self._flushed(reader)
+            rows = reader.execute(sql, params).fetchall()
+        finally:
+            reader.commit()
+        buffered = [row for batch in batches if batch is not None and batch[0] > flushed
+                    for row in batch[1] if first <= row[0] < last]
+        return rows, buffered
+
+    def buckets(self, start: float, end: float, step: float) -> Dict[str, Any]:
+        """
+        Focus min/avg/max per `step` seconds for the buckets (aligned to
+        multiples of `step`) that cover [start, end). Served from the largest
+        roll-up no longer than the step, with the step rounded to a whole
+        number of its buckets (the response carries the step used), or from
+        raw samples for steps below the smallest roll-up. Windows still in
+        the write buffer are folded in, so the newest bucket is current.
+        """
+        if not all(map(math.isfinite, (start, end, step))) or step <= 0 or end <= start:
+            raise ValueError("need finite from < to and a positive step")
+        source = max((seconds for seconds in HISTORY_ROLLUPS if seconds <= step), default=None)
+        if source is not None:
+            step = round(step / source) * source
+        if (end - start) / step > HISTORY_MAX_BUCKETS:
+            raise ValueError(f"more than {HISTORY_MAX_BUCKETS} buckets, use a larger step")
+        first = start - start % step
+        last = -(-end // step) * step
+        if self.conn is None:
+            rows, pending = [], []
+        elif source is None:
+            rows, pending = self._read(
+                "SELECT CAST(ts / ? AS INTEGER), count(*), count(focus), total(focus), min(focus), max(focus)"
+                " FROM samples WHERE ts >= ? AND ts < ? GROUP BY 1 ORDER BY 1", (step, first, last), first, last)
+        else:
+            rows, pending = self._read(
+                "SELECT CAST(start / ? AS INTEGER), sum(windows), sum(scored), sum(focus_sum), min(focus_min),"
+                " max(focus_max) FROM rollups WHERE seconds = ? AND start >= ? AND start < ? GROUP BY 1 ORDER BY 1",
+                (step, source, first, last), first, last)
+        merged = {index: list(values) for index, *values in rows}
+        for (_, bucket_start), extra in self._fold(pending, (step,)).items():
+            bucket = merged.setdefault(int(bucket_start // step), [0, 0, 0.0, None, None])
+            bucket[0] += extra[0]
+            bucket[1] += extra[1]
+            bucket[2] += extra[2]
+            for i, pick in ((3, min), (4, max)):
+                if extra[i] is not None:
+                    bucket[i] = extra[i] if bucket[i] is None else pick(bucket[i], extra[i])
+        return {
+            "from": start, "to": end, "step": step,
+            "source": f"{source}s roll-up" if source else "samples",
+            "buckets": [{
+                "start": index * step,
+                "windows": windows,
+                "focus": {"min": focus_min, "avg": focus_sum / scored, "max": focus_max} if scored else None,
+            } for index, (windows, scored, focus_sum, focus_min, focus_max) in sorted(merged.items())],
+        }
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Windows with start <= timestamp < end (epoch seconds), oldest first;
+        with `limit`, the newest `limit` of them.
+        """
+        start = -math.inf if start is None else start
+        end = math.inf if end is None else end
+        if self.conn is None:
+            return []
+        sql = "SELECT * FROM samples WHERE ts >= ? AND ts < ? ORDER BY ts DESC"
+        params = (start, end)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        rows, pending = self._read(sql, params, start, end)
+        rows.reverse()
+        rows.extend(row for row in pending if not rows or row[0] > rows[-1][0])
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else []
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+    def close(self):
+        self.flush()
 
 class AlertManager:
-    def __init__(self):
+    def __init__(self, model: Optional[FocusModel] = None):
         self.active_alerts = {}
         self.alert_queue = queue.Queue()
         self.response_queue = queue.Queue()
+        # Features behind each model-scored alert, until the user answers it
+        self.model = model
+        self.alert_features = {}
+        self.features_lock = threading.Lock()
     
-    def create_alert(self, alert_type: AlertType, focus_level: float) -> Alert:
+    def create_alert(self, alert_type: AlertType, focus_level: float, features=None) -> Alert:
         alert_id = f"alert_{int(time.time())}_{len(self.active_alerts)}"
         intensity = 1.0 - focus_level
         
@@ -238,6 +1463,11 @@ class AlertManager:
         
         self.active_alerts[alert_id] = alert
         self.alert_queue.put(alert)
+        if self.model is not None and features is not None:
+            with self.features_lock:
+                self.alert_features[alert_id] = features
+                while len(self.alert_features) > MODEL_PENDING_ALERTS:
+                    del self.alert_features[next(iter(self.alert_features))]
         return alert
     
     def handle_response(self, alert_id: str, response: UserResponse) -> Dict[str, Any]:
@@ -248,44 +1478,590 @@ class AlertManager:
             result = {"alert_id": alert_id, "response": "snoozed"}
         elif response == UserResponse.DISMISS:
             del self.active_alerts[alert_id]
+            self._learn(alert_id, 0.0)
             result = {"alert_id": alert_id, "response": "dismissed"}
         elif response == UserResponse.TAKE_BREAK:
             del self.active_alerts[alert_id]
+            self._learn(alert_id, 1.0)
             result = {"alert_id": alert_id, "response": "break_taken"}
         else:
             result = {"error": "Invalid response"}
         
         return result
+
+    def _learn(self, alert_id: str, label: float):
+        with self.features_lock:
+            features = self.alert_features.pop(alert_id, None)
+        if features is not None:
+            self.model.learn(features, label)
+
     
     # def get_pending_alerts(self) -> List[Dict]:
     #     return [asdict(alert) for alert in self.active_alerts.values()]
 
+@dataclass
+class ScheduledTimer:
+    deadline: float
+    callback: Any
+    args: tuple
+    cancelled: bool = False
+
+class TimerScheduler:
+    """
+    One thread serving a heap of monotonic-clock deadlines.
+
+    schedule() returns a ScheduledTimer that cancel() switches off; cancelled
+    entries are skipped lazily when they reach the top of the heap. Callbacks
+    run on the scheduler thread, so they must not block for long.
+    """
+    def __init__(self):
+        self.heap = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        with self.cond:
+            self.running = True
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            for _, _, timer in self.heap:
+                timer.cancelled = True
+            self.heap.clear()
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def schedule(self, delay: float, callback, *args) -> ScheduledTimer:
+        timer = ScheduledTimer(time.monotonic() + delay, callback, args)
+        with self.cond:
+            heapq.heappush(self.heap, (timer.deadline, next(self.seq), timer))
+            self.cond.notify()
+        return timer
+
+    def cancel(self, timer: Optional[ScheduledTimer]):
+        if timer is None:
+            return
+        with self.cond:
+            timer.cancelled = True
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running:
+                    while self.heap and self.heap[0][2].cancelled:
+                        heapq.heappop(self.heap)
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    delay = self.heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if not self.running:
+                    return
+                _, _, timer = heapq.heappop(self.heap)
+
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"[Timer] Callback error: {e}")
+
+class CoalescingQueue:
+    """
+    Bounded queue of outbound watch updates.
+
+    Plain load updates coalesce: only the newest one waits, because an older
+    reading is worthless once a newer one exists. Urgent updates (vibrate) keep
+    their order and are never lost; if more than maxsize pile up while the
+    watch is unreachable, the newest is merged into the last queued slot so
+    the watch still buzzes, with the latest load. Not thread-safe by itself.
+    """
+    def __init__(self, maxsize: int = WATCH_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.urgent = deque()
+        self.latest = None
+
+    def __len__(self):
+        return len(self.urgent) + (self.latest is not None)
+
+    def put(self, frame, urgent: bool = False):
+        if not urgent:
+            self.latest = frame
+            return
+        # An urgent update carries a fresher load than any waiting update
+        self.latest = None
+        if len(self.urgent) >= self.maxsize:
+            self.urgent[-1] = frame
+        else:
+            self.urgent.append(frame)
+
+    def pop(self):
+        if self.urgent:
+            return self.urgent.popleft(), True
+        frame, self.latest = self.latest, None
+        return frame, False
+
+    def requeue(self, frame, urgent: bool):
+        # Put back an update that could not be sent, unless something newer replaced it
+        if urgent:
+            self.urgent.appendleft(frame)
+        elif not self:
+            self.latest = frame
+
+class WatchUpdate(NamedTuple):
+    load: float
+    vibrate: bool
+    snooze: bool
+    snoozeTime: float
+
+@lru_cache(maxsize=64, typed=True)
+def _json_tail(vibrate: bool, snooze: bool, snoozeTime) -> bytes:
+    return (json.dumps({"vibrate": vibrate, "snooze": snooze, "snoozeTime": snoozeTime})[1:] + "\n").encode('utf-8')
+
+def encode_json_update(update: WatchUpdate) -> bytes:
+    # Same bytes as json.dumps of the whole dict; only the load varies per tick
+    return b'{"load": ' + repr(update.load).encode('ascii') + b', ' + _json_tail(update.vibrate, update.snooze, update.snoozeTime)
+
+@lru_cache(maxsize=2048)
+def _binary_frame(load: int, flags: int, snooze_seconds: int) -> bytes:
+    return WATCH_FRAME.pack(WATCH_FRAME_MAGIC, load, flags, snooze_seconds)
+
+def encode_binary_update(update: WatchUpdate) -> bytes:
+    load = min(100, max(0, int(update.load + 0.5)))
+    flags = (1 if update.vibrate else 0) | (2 if update.snooze else 0)
+    snooze_seconds = min(0xFFFF, max(0, int(update.snoozeTime * 60 + 0.5)))
+    return _binary_frame(load, flags, snooze_seconds)
+
+WIRE_ENCODERS = {
+    "json": encode_json_update,
+    "binary": encode_binary_update,
+}
+
+class FrameDecoder:
+    """
+    Incremental decoder for newline-framed watch messages.
+
+    feed() takes whatever a read returned (half a command, several, or a mix)
+    and returns the complete messages; any partial tail stays in a reusable
+    buffer for the next read. A line longer than max_frame is discarded up to
+    its newline. finish() flushes an unterminated tail at EOF, so a watch that
+    sends a bare "SNOOZE" and closes still works.
+    """
+    def __init__(self, max_frame: int = WATCH_MAX_FRAME):
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+        self.discarding = False
+
+    def feed(self, data: bytes) -> List[str]:
+        buf = self.buffer
+        buf += data
+        messages = []
+        start = 0
+        while True:
+            end = buf.find(b'\n', start)
+            if end < 0:
+                break
+            if self.discarding:
+                self.discarding = False
+            elif end - start <= self.max_frame:
+                self._append(messages, buf[start:end])
+            start = end + 1
+        del buf[:start]
+        if len(buf) > self.max_frame:
+            buf.clear()
+            self.discarding = True
+        return messages
+
+    def finish(self) -> List[str]:
+        messages = []
+        if not self.discarding:
+            self._append(messages, self.buffer)
+        self.buffer.clear()
+        self.discarding = False
+        return messages
+
+    @staticmethod
+    def _append(messages: List[str], line):
+        msg = line.strip()
+        if msg:
+            messages.append(msg.decode('utf-8', errors='replace'))
+
+def parse_device(device: str):
+    # Paired devices are stored as "host" or "host:port"
+    if not isinstance(device, str) or not device:
+        raise ValueError("device_id must be a non-empty string")
+    host, sep, port = device.rpartition(':')
+    if not sep:
+        return device, WATCH_PORT
+    if not host or not (port.isascii() and port.isdigit()) or not 1 <= int(port) <= 65535:
+        raise ValueError(f"{device!r} is not \"host\" or \"host:port\" with a port in 1-65535")
+    return host, int(port)
+
+class WatchLink:
+    """Outbound state for one paired watch, owned by the gateway loop."""
+    def __init__(self, device: str):
+        self.device = device
+        self.host, self.port = parse_device(device)
+        self.queue = CoalescingQueue()
+        self.encode = encode_json_update
+        self.pending = asyncio.Event()
+        self.task = None
+
+class WatchGateway:
+    """
+    One asyncio event loop, on its own thread, serving every paired watch.
+
+    Inbound: a single server on LISTENER_PORT. A watch may keep its connection
+    open and send any number of commands; each is handed to on_command(device,
+    message) on the loop thread, so handlers must not block.
+    Outbound: one connection task per device that devices() returns, each
+    reconnecting with backoff and draining its own CoalescingQueue, so
+    broadcast() fans one update out to every device without a thread each.
+    Updates are encoded at send time in the wire format the watch negotiated
+    (see WIRE_ENCODERS). broadcast() and sync_devices() may be called from
+    any thread.
+    """
+    def __init__(self, devices, on_command):
+        self.devices = devices
+        self.on_command = on_command
+        self.links: Dict[str, WatchLink] = {}
+        self.formats: Dict[str, str] = {}
+        self.clients = {}
+        self.loop = None
+        self.stopping = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.ready.clear()
+        self.thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+        self.thread.start()
+        self.ready.wait(timeout=2)
+
+    def stop(self):
+        loop = self.loop
+        if loop:
+            loop.call_soon_threadsafe(self.stopping.set)
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def broadcast(self, update: WatchUpdate, urgent: bool = False):
+        loop = self.loop
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(self._enqueue, update, urgent)
+
+    def sync_devices(self):
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._sync_devices)
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        server = None
+        try:
+            try:
+                server = await asyncio.start_server(self._serve_watch, '0.0.0.0', LISTENER_PORT)
+                print(f"[Socket] Listening for watch commands on port {LISTENER_PORT}...", flush=True)
+            except OSError as e:
+                print(f"[Socket] Listener Error: {e}", flush=True)
+
+            self._sync_devices()
+            self.ready.set()
+            await self.stopping.wait()
+        finally:
+            # Whatever ended the loop, callers must stop scheduling onto it
+            self.loop = None
+            self.ready.set()
+            if server:
+                server.close()
+            # Closing the transports lets each inbound reader see EOF and finish
+            for writer in self.clients:
+                writer.close()
+            await asyncio.gather(*self.clients.values(), return_exceptions=True)
+            if server:
+                await server.wait_closed()
+            links, self.links = list(self.links.values()), {}
+            for link in links:
+                link.task.cancel()
+            await asyncio.gather(*(link.task for link in links), return_exceptions=True)
+
+    def set_format(self, host: str, wire_format: str):
+        # Called on the loop thread from a watch's FORMAT command
+        if wire_format not in WIRE_ENCODERS:
+            raise ValueError(f"unknown wire format {wire_format!r}")
+        self.formats[host] = wire_format
+        for link in self.links.values():
+            if link.host == host:
+                link.encode = WIRE_ENCODERS[wire_format]
+        print(f"[Socket] {host} switched to {wire_format} frames", flush=True)
+
+    def _sync_devices(self):
+        wanted = set(self.devices())
+        for device in wanted - self.links.keys():
+            try:
+                link = WatchLink(device)
+            except ValueError as e:
+                print(f"[Socket] Skipping paired device: {e}", flush=True)
+                continue
+            link.encode = WIRE_ENCODERS[self.formats.get(link.host, "json")]
+            link.task = asyncio.create_task(self._run_link(link))
+            self.links[device] = link
+        for device in self.links.keys() - wanted:
+            self.links.pop(device).task.cancel()
+
+    def _enqueue(self, update: WatchUpdate, urgent: bool):
+        for link in self.links.values():
+            link.queue.put(update, urgent)
+            link.pending.set()
+
+    async def _run_link(self, link: WatchLink):
+        backoff = WATCH_BACKOFF_MIN
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(link.host, link.port), WATCH_CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"[Socket] {link.device} connect failed ({e or 'timeout'}), retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, WATCH_BACKOFF_MAX)
+                continue
+
+            connected_at = time.monotonic()
+            print(f"[Socket] Connected to watch at {link.device}")
+            # The watch may also talk back on this connection; EOF means it is gone
+            closed = asyncio.create_task(self._read_commands(link.host, reader))
+            try:
+                await self._drain_link(link, writer, closed)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"[Socket] {link.device} link lost: {e or 'send timeout'}")
+            finally:
+                closed.cancel()
+                writer.close()
+            # A peer that accepts and hangs up at once must not get a tight
+            # reconnect loop: only a link that stayed up resets the backoff
+            if time.monotonic() - connected_at >= WATCH_STABLE_LINK:
+                backoff = WATCH_BACKOFF_MIN
+            else:
+                print(f"[Socket] {link.device} dropped quickly, reconnecting in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, WATCH_BACKOFF_MAX)
+
+    async def _drain_link(self, link: WatchLink, writer, closed):
+        while not closed.done():
+            waiter = asyncio.create_task(link.pending.wait())
+            await asyncio.wait({waiter, closed}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            link.pending.clear()
+            while link.queue and not closed.done():
+                update, urgent = link.queue.pop()
+                try:
+                    frame = link.encode(update)
+                except Exception as e:
+                    # A frame that cannot be encoded never will be: drop it,
+                    # not the link
+                    print(f"[Socket] Dropped update for {link.device} ({update}): {e}", flush=True)
+                    continue
+                try:
+                    writer.write(frame)
+                    await asyncio.wait_for(writer.drain(), WATCH_SEND_TIMEOUT)
+                except BaseException:
+                    link.queue.requeue(update, urgent)
+                    raise
+                print(f"[Socket] Sent to {link.device}: {update}")
+
+    async def _serve_watch(self, reader, writer):
+        host = writer.get_extra_info('peername')[0]
+        self.clients[writer] = asyncio.current_task()
+        try:
+            await self._read_commands(host, reader)
+        finally:
+            del self.clients[writer]
+            writer.close()
+
+    async def _read_commands(self, device: str, reader):
+        decoder = FrameDecoder()
+        while True:
+            try:
+                data = await reader.read(4096)
+            except OSError:
+                data = b''
+            messages = decoder.feed(data) if data else decoder.finish()
+            for msg in messages:
+                try:
+                    self.on_command(device, msg)
+                except Exception as e:
+                    print(f"[Socket] Command Error ({msg!r} from {device}): {e}", flush=True)
+            if not data:
+                return
+
+class Subscription:
+    """
+    One dashboard connection. Changes are merged into a single pending dict
+    rather than queued, so a slow reader costs at most one value per field
+    and simply receives the latest state when it catches up.
+    """
+    def __init__(self, initial: Dict[str, Any]):
+        self.cond = threading.Condition()
+        self.pending = initial
+        self.coalesced = 0
+
+    def offer(self, changes: Dict[str, Any]):
+        with self.cond:
+            if self.pending:
+                self.coalesced += 1
+            self.pending.update(changes)
+            self.cond.notify()
+
+    def take(self, timeout: float) -> Dict[str, Any]:
+        # Blocks until something changed or `timeout` passed ({} then)
+        with self.cond:
+            if not self.pending:
+                self.cond.wait(timeout)
+            changes, self.pending = self.pending, {}
+            return changes
+
+class EventHub:
+    """
+    Fans state changes out to dashboard subscribers (the /api/events
+    stream). publish() keeps only the fields whose value actually changed,
+    so every message is a delta; a new subscriber first receives the full
+    current picture. Publishing never blocks on a subscriber (see
+    Subscription), and at most SSE_MAX_SUBSCRIBERS may be connected.
+
+    `version` counts effective changes; together with the process start it
+    tags the state for /api/snapshot, whose JSON is built at most once per
+    version (snapshot()).
+    """
+    def __init__(self, max_subscribers: int = SSE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self.lock = threading.Lock()
+        self.current = {}
+        self.subscribers = set()
+        self.version = 0
+        self.boot = format(int(time.time()), 'x')
+        self.snapshot_version = -1
+        self.snapshot_body = b''
+
+    def publish(self, fields: Dict[str, Any]):
+        with self.lock:
+            changes = {name: value for name, value in fields.items()
+                       if name not in self.current or self.current[name] != value}
+            if not changes:
+                return
+            self.current.update(changes)
+            self.version += 1
+            for subscriber in self.subscribers:
+                subscriber.offer(changes)
+
+    def subscribe(self) -> Optional[Subscription]:
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscription(dict(self.current))
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscription):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def etag(self, version: Optional[int] = None) -> str:
+        return f"{self.boot}-{self.version if version is None else version}"
+
+    def snapshot(self):
+        # (etag, JSON bytes) of the current state laid out as SNAPSHOT_GROUPS
+        with self.lock:
+            if self.snapshot_version != self.version:
+                current = self.current
+                payload = {group: {name: current.get(name) for name in names}
+                           for group, names in SNAPSHOT_GROUPS.items()}
+                payload["settings"]["window_seconds"] = WINDOW_SECONDS
+                payload["focus"]["is_low_focus"] = current.get("focus_level", 0.8) < 0.6
+                payload["version"] = self.version
+                self.snapshot_body = json.dumps(payload, default=_json_default).encode()
+                self.snapshot_version = self.version
+            return self.etag(self.snapshot_version), self.snapshot_body
+
 class FocusMonitoringSystem:
+    """
+    Owns the monitoring pipeline and the shared SystemState.
+
+    Concurrency model: copy-on-write snapshots. `state` is always a complete
+    immutable SystemState; writers (the monitoring thread, the watch
+    gateway, the snooze timer, Flask request threads) go through
+    update_state(), which under `state_lock` builds the next snapshot,
+    swaps the reference and publishes the changed fields to the EventHub.
+    Readers just read `state` and never wait for, or see half of, a write.
+    A reader that needs several fields should take `state = self.state`
+    once and use that.
+
+    Throughput ceiling: writes are serialized, each costing one replace()
+    of the dataclass plus an EventHub publish, about 10-15 us, so roughly
+    60-100k state changes per second. The sampler makes one or two per
+    window and API calls a handful, many orders of magnitude below that.
+    Reads are an attribute load and scale with readers; serialization is
+    per snapshot (to_json()), so N polls of the same state encode it once.
+    """
     def __init__(self):
-        self.state = SystemState()
+        self.state = SystemState(paired_devices=(f"{WATCH_IP}:{WATCH_PORT}",))
+        self.state_lock = threading.Lock()
         self.input_monitor = InputMonitor()
-        self.analyzer = FocusAnalyzer()
-        self.alert_manager = AlertManager()
+        self.model = FocusModel() if FOCUS_MODEL_ENABLED and NUMPY_AVAILABLE else None
+        self.analyzer = FocusAnalyzer(model=self.model)
+        self.baseline_store = BaselineStore()
+        if self.baseline_store.load(self.analyzer):
+            print("[Baselines] Restored from last session", flush=True)
+        self.state = self.state.replace(baselines=self.analyzer.baseline_summary())
+        self.alert_manager = AlertManager(self.model)
+        self.history = FocusHistory()
         self.monitoring_thread = None
         self.running = False
+        self.loop_wakeup = threading.Event()
+        self.last_alert_time = datetime.now() - timedelta(minutes=5)
 
         self.last_watch_update = 0.0
         self.watch_update_interval: float = 5.0 # Watch update interval
+        self.events = EventHub()
+        self.events.publish({name: _event_value(getattr(self.state, name)) for name in EVENT_FIELDS})
+        self.gateway = WatchGateway(lambda: self.state.paired_devices, self.handle_watch_command)
+        self.scheduler = TimerScheduler()
+        self.snooze_lock = threading.Lock()
+        self.snooze_wakeup = None
+        self.watch_commands = {
+            "SNOOZE": lambda device, arg: self.start_snooze(getattr(self.state, 'snooze_timer', 1)),
+            "CANCEL": lambda device, arg: self.cancel_snooze(),
+            "ACK": lambda device, arg: print(f"[Socket] {device} acknowledged", flush=True),
+            "FORMAT": lambda device, arg: self.gateway.set_format(device, arg.strip().lower()),
+        }
         
     def start_monitoring(self):
         if self.state.monitoring_active:
             return {"status": "already_running"}
         
         self.input_monitor.start()
-        self.state.monitoring_active = True
+        self.update_state(monitoring_active=True)
         self.running = True
+        self.scheduler.start()
         
         # IVAN ADDED
-        # Watch thread that will listen to the watch
-        socket_thread = threading.Thread(target=self.listen_for_snooze, daemon=True)
-        socket_thread.start()
+        # Gateway loop that talks to (and listens to) the watches
+        self.gateway.start()
 
 
+        self.loop_wakeup.clear()
         self.monitoring_thread = threading.Thread(target=self._monitoring_loop)
         self.monitoring_thread.daemon = True
         self.monitoring_thread.start()
@@ -294,73 +2070,127 @@ class FocusMonitoringSystem:
     
     def stop_monitoring(self):
         self.running = False
-        self.state.monitoring_active = False
+        self.loop_wakeup.set()
+        self.update_state(monitoring_active=False)
         self.input_monitor.stop()
+        self.cancel_snooze()
+        self.scheduler.stop()
+        self.gateway.stop()
         
         if self.monitoring_thread:
             self.monitoring_thread.join(timeout=2)
+        self.baseline_store.save(self.analyzer)
+        self.history.close()
         
         return {"status": "stopped"}
+
+    def save_progress(self):
+        # Run at process exit too: the app quits by killing us, not via /api/system/stop
+        self.baseline_store.save(self.analyzer)
+        self.history.flush()
     
     def _monitoring_loop(self):
-        last_alert_time = datetime.now() - timedelta(minutes=5)
-        
+        """
+        Samples on a grid of time.monotonic() deadlines, so a window is
+        exactly WINDOW_SECONDS however long the previous tick took. A tick
+        that is a full period or more late (a suspended laptop, a stalled
+        tick) is not caught up: the oversized window is discarded, since
+        scoring it against per-window baselines would be meaningless, and
+        the grid restarts from now. `loop_wakeup` interrupts the wait on stop
+        or a settings change.
+        """
+        period = WINDOW_SECONDS
+        deadline = time.monotonic() + period
         while self.running:
+            now = time.monotonic()
+            if now < deadline:
+                self.loop_wakeup.wait(deadline - now)
+                self.loop_wakeup.clear()
+                continue
+            if now - deadline >= period:
+                print(f"[Monitor] {int((now - deadline) // period)} tick(s) late, discarding the window", flush=True)
+                self.input_monitor.get_and_reset_metrics()
+                deadline = now + period
+                continue
+            deadline += period
             try:
-                interaction = self.input_monitor.get_and_reset_metrics()
-                self.analyzer.add_interaction(interaction)
-                
-                if len(self.analyzer.interactions) >= 5:
-                    focus_level = self.analyzer.calculate_focus_score()
-                    self.state.focus_level = focus_level
-                    print(focus_level)
-                    print (f"[Load Percent: ] {(1 - focus_level)*100 :.2f}%")
-                    
-                    should_vibrate = False
-                    
-                    if focus_level < 0.4:
-                        current_time = datetime.now()
-                        if current_time - last_alert_time > timedelta(minutes=0.5):
-                            if not self.state.is_snoozed or current_time > self.state.snooze_until:
-                                alert = self.alert_manager.create_alert(
-                                    AlertType.FOCUS_DROP,
-                                    focus_level
-                                )
-                                self.state.current_alert = alert
-                                last_alert_time = current_time
-                                self.state.is_snoozed = False
-                                should_vibrate = True # Trigger vibration for this specific update
-
-                                new_break = {
-                                    "id": self.state.break_history[0]["id"] + 1 if self.state.break_history else 1,
-                                    "timestamp": datetime.now().isoformat(),
-                                    "duration": 5
-                                }
-                                self.state.break_history.insert(0, new_break)
-                                self.state.break_history = self.state.break_history[:10]
-                                print ("Break added to history.")
-
-                    self.send_to_watch(
-                        load=1.0 - focus_level, 
-                        vibrate=should_vibrate, 
-                        snooze=self.state.snooze_feature_enabled,
-                        snoozeTime=getattr(self.state, 'snooze_timer', 5)
-                    )
-                
-                time.sleep(5)
-                
+                self._monitoring_tick()
             except Exception as e:
                 print(f"Error in loop: {e}")
-                time.sleep(10)
-    
+
+    def _monitoring_tick(self):
+        interaction = self.input_monitor.get_and_reset_metrics()
+        self.analyzer.add_interaction(interaction)
+        self.update_state(baselines=self.analyzer.baseline_summary())
+        if self.analyzer.typing.count % BASELINE_SAVE_EVERY == 0:
+            self.baseline_store.save(self.analyzer)
+
+        if not self.analyzer.has_score():
+            self.history.append(interaction, None)
+        else:
+            focus_level = self.analyzer.calculate_focus_score()
+            self.history.append(interaction, focus_level)
+            state = self.update_state(focus_level=focus_level)
+            print(focus_level)
+            print (f"[Load Percent: ] {(1 - focus_level)*100 :.2f}%")
+
+            should_vibrate = False
+
+            if focus_level < 0.4:
+                current_time = datetime.now()
+                if current_time - self.last_alert_time > timedelta(minutes=0.5):
+                    if (not state.is_snoozed or current_time > state.snooze_until) \
+                            and self._model_allows_alert(current_time):
+                        alert = self.alert_manager.create_alert(
+                            AlertType.FOCUS_DROP,
+                            focus_level,
+                            self.analyzer.model_input
+                        )
+                        self.last_alert_time = current_time
+                        should_vibrate = True # Trigger vibration for this specific update
+
+                        def record_alert(state):
+                            new_break = {
+                                "id": state.break_history[0]["id"] + 1 if state.break_history else 1,
+                                "timestamp": datetime.now().isoformat(),
+                                "duration": 5
+                            }
+                            return {"current_alert": alert, "is_snoozed": False,
+                                    "break_history": (new_break,) + state.break_history[:9]}
+                        state = self.update_state(record_alert)
+                        print ("Break added to history.")
+
+            self.send_to_watch(
+                load=1.0 - focus_level, 
+                vibrate=should_vibrate, 
+                snooze=state.snooze_feature_enabled,
+                snoozeTime=getattr(state, 'snooze_timer', 5)
+            )
+
+    def _model_allows_alert(self, current_time: datetime) -> bool:
+        if self.analyzer.alert_confirmed():
+            return True
+        # Counts as the alert for the cooldown, so this is logged at most every 30 s
+        self.last_alert_time = current_time
+        print("[Model] Skipping alert: past responses say this one would be dismissed", flush=True)
+        return False
+
     def update_settings(self, settings: Dict[str, Any]):
         # IVAN: GUI calls this to update settings
+        changes = {}
         if "auto_start_enabled" in settings:
-            self.state.auto_start_enabled = settings["auto_start_enabled"]
+            changes["auto_start_enabled"] = settings["auto_start_enabled"]
         if "snooze_feature_enabled" in settings:
-            self.state.snooze_feature_enabled = settings["snooze_feature_enabled"]
+            changes["snooze_feature_enabled"] = settings["snooze_feature_enabled"]
         if "snooze_timer" in settings:
-            self.state.snooze_timer = settings["snooze_timer"]
+            changes["snooze_timer"] = settings["snooze_timer"]
+        if "baseline_half_life_minutes" in settings:
+            minutes = float(settings["baseline_half_life_minutes"])
+            if minutes > 0:
+                changes["baseline_half_life_minutes"] = minutes
+                self.analyzer.set_baseline_half_life(minutes * 60 / WINDOW_SECONDS)
+        self.update_state(**changes)
+        self.loop_wakeup.set()
         return {"status": "settings_updated"}
 
     # IVAN ADDED FUNCTIONALITY FOR SENDING THINGS TO THE WATCH
@@ -372,76 +2202,85 @@ class FocusMonitoringSystem:
                 if not vibrate: 
                     return
 
-        try:
-            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client.settimeout(2)
-            client.connect((WATCH_IP, WATCH_PORT))
-            load = load * 100 
-            data = json.dumps({"load": load, "vibrate": vibrate, "snooze": snooze, "snoozeTime": snoozeTime})
-            client.sendall(f"{data}\n".encode('utf-8'))
-            client.close()
-            print(f"[Socket] Sent to watch: {data}")
-
-        except Exception as e:
-            print(f"[Socket] Send Error: {e}")
-
-    def listen_for_snooze(self):
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
-        try:
-            server.bind(('0.0.0.0', LISTENER_PORT))
-            server.listen(1)
-            print(f"[Socket] Listening for SNOOZE on port {LISTENER_PORT}...", flush=True)
-            
-            while self.running:
-                try:
-                    server.settimeout(1.0)
-                    try:
-                        client, addr = server.accept()
-                    except socket.timeout:
-                        continue
-                        
-                    msg = client.recv(1024).decode('utf-8').strip()
-                    
-                    if msg == "SNOOZE":
-                        snooze_minutes = getattr(self.state, 'snooze_timer', 1)
-                        print(f"\n>>> WATCH TRIGGERED SNOOZE. Sleeping for {snooze_minutes} mins... <<<\n", flush=True)
-                        
-                        self.state.is_snoozed = True
-                        self.state.snooze_until = datetime.now() + timedelta(minutes=snooze_minutes)
-                        client.close()
-
-                        time.sleep(snooze_minutes * 60)
-
-                        print(f"\n>>> SNOOZE FINISHED. Waking up watch! <<<\n", flush=True)
-                        self.state.is_snoozed = False
-                        
-                        current_load = 1.0 - self.state.focus_level
-
-                        self.send_to_watch(
-                            load=current_load,
-                            vibrate=True,       
-                            snooze=True,
-                            snoozeTime=snooze_minutes,
-                            fromSnooze=True
-                        )
+        load = load * 100 
+        self.gateway.broadcast(WatchUpdate(load, vibrate, snooze, snoozeTime), urgent=vibrate)
 
-                        continue
-                            
-                    client.close()
-                    
-                except Exception as e:
-                    print(f"[Socket] Listener Error: {e}", flush=True)
-        finally:
-            server.close()
+    def start_snooze(self, snooze_minutes):
+        # A new SNOOZE replaces any running one rather than stacking
+        with self.snooze_lock:
+            self.scheduler.cancel(self.snooze_wakeup)
+            print(f"\n>>> WATCH TRIGGERED SNOOZE. Sleeping for {snooze_minutes} mins... <<<\n", flush=True)
+            self.update_state(is_snoozed=True, snooze_until=datetime.now() + timedelta(minutes=snooze_minutes))
+            self.snooze_wakeup = self.scheduler.schedule(snooze_minutes * 60, self._finish_snooze, snooze_minutes)
+
+    def cancel_snooze(self):
+        with self.snooze_lock:
+            if self.snooze_wakeup is None:
+                return
+            self.scheduler.cancel(self.snooze_wakeup)
+            self.snooze_wakeup = None
+            self.update_state(is_snoozed=False, snooze_until=None)
+        print("\n>>> SNOOZE CANCELLED. <<<\n", flush=True)
+
+    def _finish_snooze(self, snooze_minutes):
+        with self.snooze_lock:
+            # Lost a race with a newer SNOOZE or a CANCEL: that one wins
+            if self.snooze_wakeup is None or self.snooze_wakeup.deadline > time.monotonic():
+                return
+            self.snooze_wakeup = None
+            self.update_state(is_snoozed=False)
+
+        print(f"\n>>> SNOOZE FINISHED. Waking up watch! <<<\n", flush=True)
+        current_load = 1.0 - self.state.focus_level
+
+        self.send_to_watch(
+            load=current_load,
+            vibrate=True,       
+            snooze=True,
+            snoozeTime=snooze_minutes,
+            fromSnooze=True
+        )
+
+    def handle_watch_command(self, device: str, msg: str):
+        # Runs on the gateway loop: handlers must return quickly
+        verb, _, arg = msg.partition(' ')
+        handler = self.watch_commands.get(verb.upper())
+        if handler is None:
+            print(f"[Socket] Unknown command from {device}: {msg!r}", flush=True)
+            return
+        handler(device, arg)
 
+    def set_context(self, context: str):
+        self.analyzer.set_context(context)
+        self.update_state(context=context)
+        return {"status": "context_updated", "context": context}
 
-from flask import Flask, request, jsonify
+    def update_state(self, derive=None, **changes) -> SystemState:
+        """
+        Applies `changes`, plus whatever derive(current_state) returns for
+        read-modify-write updates, as one new snapshot. Returns it.
+        """
+        with self.state_lock:
+            if derive is not None:
+                changes.update(derive(self.state))
+            if not changes:
+                return self.state
+            state = self.state = self.state.replace(**changes)
+            self.events.publish({name: _event_value(value) for name, value in changes.items() if name in EVENT_FIELDS})
+        return state
+
+    def pair_device(self, device_id: str):
+        state = self.update_state(lambda state: {} if device_id in state.paired_devices
+                                  else {"paired_devices": state.paired_devices + (device_id,)})
+        self.gateway.sync_devices()
+        return {"status": "paired", "paired_devices": list(state.paired_devices)}
+
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag"])
 
 system = FocusMonitoringSystem()
 
@@ -453,11 +2292,18 @@ system = FocusMonitoringSystem()
   * GET  /api/settings - Show current settings
   * PUT  /api/settings - Update settings from GUI
   * GET  /api/data/focus-level - Display focus level graph
+  * GET  /api/snapshot - State, settings and focus in one payload (ETag/304)
+  * GET  /api/events - Live state/focus/alert updates (Server-Sent Events)
+  * GET  /api/data/focus-level/history - Focus min/avg/max buckets over a range
+  * GET  /api/data/history - Stored focus score and raw features per window
+  * POST /api/devices/pair - Pair a watch ("host" or "host:port")
+  * GET  /api/devices - List paired watches
+  * PUT  /api/context - Set the activity context used for baseline profiles
 """
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy"})
+    return jsonify({"status": "healthy", "input_samples_dropped": system.input_monitor.dropped()})
 
 @app.route('/api/system/start', methods=['POST'])
 def start_system():
@@ -471,7 +2317,7 @@ def stop_system():
 
 @app.route('/api/system/state', methods=['GET'])
 def get_system_state():
-    return jsonify(asdict(system.state))
+    return Response(system.state.to_json(), mimetype='application/json')
 
 # @app.route('/api/alerts', methods=['GET'])
 # def get_alerts():
@@ -488,54 +2334,140 @@ def respond_to_alert(alert_id):
         response = UserResponse(response_type)
         
         if response == UserResponse.SNOOZE:
-            system.state.is_snoozed = True
-            system.state.snooze_until = datetime.now() + timedelta(minutes=5)
+            system.update_state(is_snoozed=True, snooze_until=datetime.now() + timedelta(minutes=5))
         
         result = system.alert_manager.handle_response(alert_id, response)
         return jsonify(result)
     except ValueError:
         return jsonify({"error": "Invalid response type"}), 400
 
-# @app.route('/api/devices/pair', methods=['POST'])
-# def pair_device():
-#     # BOGDAN/KAAN: Call this when smartwatch connects for the first time
-#     data = request.json
-#     device_id = data.get('device_id')
+@app.route('/api/devices/pair', methods=['POST'])
+def pair_device():
+    # BOGDAN/KAAN: Call this when smartwatch connects for the first time
+    data = request.json
+    device_id = data.get('device_id')
     
-#     if not device_id:
-#         return jsonify({"error": "device_id is required"}), 400
+    if not device_id:
+        return jsonify({"error": "device_id is required"}), 400
+    try:
+        parse_device(device_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
         
-#     result = system.pair_device(device_id)
-#     return jsonify(result)
+    result = system.pair_device(device_id)
+    return jsonify(result)
 
-# @app.route('/api/devices', methods=['GET'])
-# def get_paired_devices():
-#     return jsonify({"paired_devices": system.state.paired_devices})
+@app.route('/api/devices', methods=['GET'])
+def get_paired_devices():
+    return jsonify({"paired_devices": list(system.state.paired_devices)})
 
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
     # IVAN: Add settings for timer
+    state = system.state
     settings = {
-        "auto_start_enabled": system.state.auto_start_enabled,
-        "snooze_feature_enabled": system.state.snooze_feature_enabled,
-        "snooze_timer": system.state.snooze_timer
-
+        "auto_start_enabled": state.auto_start_enabled,
+        "snooze_feature_enabled": state.snooze_feature_enabled,
+        "snooze_timer": state.snooze_timer,
+        "baseline_half_life_minutes": state.baseline_half_life_minutes,
+        "window_seconds": WINDOW_SECONDS
     }
     return jsonify(settings)
 
 @app.route('/api/settings', methods=['PUT'])
 def update_settings():
-    data = request.json
+    data = request.json or {}
+    for name in ("snooze_timer", "baseline_half_life_minutes"):
+        if name not in data:
+            continue
+        value = data[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or not math.isfinite(value) or value <= 0:
+            return jsonify({"error": f"{name} must be a positive number"}), 400
     result = system.update_settings(data)
     return jsonify(result)
 
+@app.route('/api/context', methods=['PUT'])
+def update_context():
+    # Optional: the client tells us what the user is doing ("coding", "email",
+    # "meeting"...) so focus is compared against that activity's baseline
+    data = request.json or {}
+    context = data.get('context') or ""
+    if not isinstance(context, str) or len(context) > 64:
+        return jsonify({"error": "context must be a string of at most 64 characters"}), 400
+    try:
+        return jsonify(system.set_context(context))
+    except ValueError as e:
+        return jsonify({"error": str(e), "context": system.state.context}), 400
+
 @app.route('/api/data/focus-level', methods=['GET'])
 def get_focus_level():
+    focus_level = system.state.focus_level
     return jsonify({
-        "focus_level": system.state.focus_level,
-        "is_low_focus": system.state.focus_level < 0.6
+        "focus_level": focus_level,
+        "is_low_focus": focus_level < 0.6
     })
 
+@app.route('/api/snapshot', methods=['GET'])
+def get_snapshot():
+    # State, settings and focus in one payload, re-serialized only when
+    # something changed; polls with a matching If-None-Match get a bare 304
+    if system.events.etag() in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(system.events.etag())
+        return response
+    etag, body = system.events.snapshot()
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    # Server-Sent Events: the full state first, then "update" events carrying
+    # only the fields that changed
+    subscriber = system.events.subscribe()
+    if subscriber is None:
+        return jsonify({"error": "too many dashboard connections"}), 503
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                changes = subscriber.take(SSE_KEEPALIVE)
+                if not changes:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: update\ndata: {json.dumps(changes, default=_json_default)}\n\n"
+        finally:
+            system.events.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/data/focus-level/history', methods=['GET'])
+def get_focus_history():
+    # ?from=<epoch seconds>&to=<epoch seconds>&step=<bucket seconds>;
+    # defaults to the last hour in 1 minute buckets
+    end = request.args.get('to', type=float) or time.time()
+    start = request.args.get('from', type=float) or end - 3600
+    step = request.args.get('step', type=float) or 60.0
+    try:
+        return jsonify(system.history.buckets(start, end, step))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/data/history', methods=['GET'])
+def get_history():
+    # ?from=<epoch seconds>&to=<epoch seconds>&limit=<windows>, raw windows;
+    # the newest HISTORY_DEFAULT_LIMIT of the range unless limit says otherwise
+    start = request.args.get('from', type=float)
+    end = request.args.get('to', type=float)
+    limit = request.args.get('limit', HISTORY_DEFAULT_LIMIT, type=int)
+    if not 0 < limit <= HISTORY_MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {HISTORY_MAX_LIMIT}"}), 400
+    return jsonify({"window_seconds": WINDOW_SECONDS, "samples": system.history.query(start, end, limit)})
+
 @app.route('/api/wizard/trigger-alert', methods=['POST'])
 def wizard_trigger_alert():
     data = request.json
@@ -545,7 +2477,7 @@ def wizard_trigger_alert():
         alert_type_enum = AlertType(alert_type)
         focus_level = data.get('focus_level', 0.3)
         alert = system.alert_manager.create_alert(alert_type_enum, focus_level)
-        system.state.current_alert = alert
+        system.update_state(current_alert=alert)
         
         return jsonify({
             "status": "alert_triggered",
@@ -554,8 +2486,59 @@ def wizard_trigger_alert():
     except ValueError:
         return jsonify({"error": "Invalid alert type"}), 400
 
+class PooledWSGIServer(WSGIServer):
+    """
+    Stdlib fallback for --production without waitress: wsgiref's server
+    with requests handed to a fixed pool of threads instead of handled one
+    at a time.
+    """
+    pool = None
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+def serve_production(host: str, port: int, threads: int):
+    # One process, many threads: the monitoring system owns the input hooks
+    # and the watch sockets, so it must exist exactly once; request threads
+    # share the `system` singleton, whose state is safe to read concurrently
+    # (see SystemState, EventHub)
+    if WAITRESS_AVAILABLE:
+        print(f"[Server] waitress on {host}:{port}, {threads} threads", flush=True)
+        waitress.serve(app, host=host, port=port, threads=threads)
+        return
+    print(f"[Server] waitress not installed, stdlib server on {host}:{port}, {threads} threads", flush=True)
+    server = make_server(host, port, app, server_class=PooledWSGIServer)
+    server.pool = ThreadPoolExecutor(threads, thread_name_prefix="api")
+    try:
+        server.serve_forever()
+    finally:
+        server.pool.shutdown(wait=False)
+
 if __name__ == '__main__':
-    # TODO: Configure these deployment settings
-    # For development: host='localhost', port=5000, debug=True
-    # For production: host='0.0.0.0', port=80, debug=False
-    app.run(host='0.0.0.0', port=80, debug=False)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Cognitive load monitoring backend")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--production', action='store_true',
+                        help="serve with a multi-threaded WSGI server instead of the Flask dev server")
+    parser.add_argument('--threads', type=int, default=API_THREADS,
+                        help="request threads in --production mode")
+    args = parser.parse_args()
+
+    # The desktop app stops the backend with SIGTERM; turn that into a normal
+    # exit so the atexit hook still saves baselines and buffered history
+    atexit.register(system.save_progress)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    if args.production:
+        serve_production(args.host, args.port, args.threads)
+    else:
+        # For development: --host localhost --port 5000
+        app.run(host=args.host, port=args.port, debug=False)
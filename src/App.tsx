@@ -9,6 +9,10 @@ import { motion, AnimatePresence } from "motion/react";
 
 const ipcRenderer = (window as any).require ? (window as any).require('electron').ipcRenderer : null;
 const API_URL = "http://localhost:80/api";
+// Retry delays (ms) for reopening the live stream once the browser gives up
+// on it, e.g. after a 503 when the backend is at its subscriber limit
+const EVENTS_RETRY_MIN = 2000;
+const EVENTS_RETRY_MAX = 60000;
 
 interface Break {
   id: string;
@@ -50,44 +54,73 @@ function App() {
 
   // --- API INTEGRATION ---
 
+  // Version tag of the last snapshot we applied; an unchanged backend
+  // answers 304 without re-sending (or even re-serializing) anything
+  const snapshotEtag = useRef<string | null>(null);
+
   const fetchSystemState = async () => {
     try {
-      const stateRes = await fetch(`${API_URL}/system/state`);
-      const stateData = await stateRes.json();
-      setIsEnabled(stateData.monitoring_active);
-      
-      if (stateData.break_history) {
-        const history: Break[] = stateData.break_history.map((b: any) => ({
-          id: b.id,
-          timestamp: new Date(b.timestamp),
-          duration: b.duration
-        }));
-        setBreaks(history);
-      }
-
-      const settingsRes = await fetch(`${API_URL}/settings`);
-      const settingsData = await settingsRes.json();
-      setSnoozeEnabled(settingsData.snooze_feature_enabled);
-      setAutoStartEnabled(settingsData.auto_start_enabled);
-      
-      // Sync slider with backend value on load (if valid)
-      if (settingsData.snooze_timer) {
-         setSnoozeTime([parseInt(settingsData.snooze_timer)]);
-      }
-
-      const focusRes = await fetch(`${API_URL}/data/focus-level`);
-      const focusData = await focusRes.json();
-      setFocusLevel(focusData.focus_level);
+      const headers: Record<string, string> = {};
+      if (snapshotEtag.current) headers['If-None-Match'] = snapshotEtag.current;
+      const res = await fetch(`${API_URL}/snapshot`, { headers, cache: 'no-store' });
+      if (res.status === 304) return;
 
+      const snapshot = await res.json();
+      snapshotEtag.current = res.headers.get('ETag');
+      applyUpdate({ ...snapshot.state, ...snapshot.settings, ...snapshot.focus });
     } catch (error) {
       console.error("Failed to connect to backend:", error);
     }
   };
 
+  // Live updates: the backend streams the full state once, then only the
+  // fields that changed. EventSource reconnects on its own after network
+  // errors; the effect below reopens it after error responses.
+  const applyUpdate = (data: any) => {
+    if ('monitoring_active' in data) setIsEnabled(data.monitoring_active);
+    if ('snooze_feature_enabled' in data) setSnoozeEnabled(data.snooze_feature_enabled);
+    if ('auto_start_enabled' in data) setAutoStartEnabled(data.auto_start_enabled);
+    if ('focus_level' in data) setFocusLevel(data.focus_level);
+    if (data.snooze_timer) setSnoozeTime([parseInt(data.snooze_timer)]);
+    if (data.break_history) {
+      setBreaks(data.break_history.map((b: any) => ({
+        id: b.id,
+        timestamp: new Date(b.timestamp),
+        duration: b.duration
+      })));
+    }
+  };
+
   useEffect(() => {
-    fetchSystemState();
-    const interval = setInterval(fetchSystemState, 30000);
-    return () => clearInterval(interval);
+    let events: EventSource | null = null;
+    let retryId: ReturnType<typeof setTimeout> | undefined;
+    let retryDelay = EVENTS_RETRY_MIN;
+
+    const connect = () => {
+      events = new EventSource(`${API_URL}/events`);
+      events.onopen = () => { retryDelay = EVENTS_RETRY_MIN; };
+      events.addEventListener('update', (event) => {
+        applyUpdate(JSON.parse((event as MessageEvent).data));
+      });
+      events.onerror = () => {
+        // Catch up from the snapshot while EventSource reconnects
+        console.error("Live updates interrupted, reconnecting...");
+        fetchSystemState();
+        if (events?.readyState !== EventSource.CLOSED) return;
+        // An error response (503 when the backend has too many dashboards)
+        // closes the stream for good, so reopen it ourselves, backing off
+        // and polling the snapshot until it is accepted
+        events.close();
+        retryId = setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, EVENTS_RETRY_MAX);
+      };
+    };
+
+    connect();
+    return () => {
+      clearTimeout(retryId);
+      events?.close();
+    };
   }, []);
 
   // --- NEW LOGIC: AUTO-SAVE SNOOZE TIMER ---